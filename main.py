@@ -3,31 +3,22 @@ import os
 import argparse
 import json
 import pandas as pd
+import numpy as np
 from datetime import datetime
+from collections.abc import Iterator
 from rich.console import Console
 from rich.table import Table
 
 # Local imports
 from src.config import settings
 from src.utils.logger import logger
-from src.utils.exporter import export_data
+from src.utils.exporter import export_data, export_chunks, export_file, peek_chunks
 from src.utils.mailer import send_emails
+from src.core.engines.registry import get_engine
+from src.utils.cache import result_cache
 
 console = Console()
 
-def get_engine(engine_name, region="global"):
-    if engine_name == "ta":
-        from src.core.engines.ta_engine import ThinkingDataEngine
-        config = settings.TA_CREDENTIALS.get(region)
-        return ThinkingDataEngine(config)
-    elif engine_name == "odps":
-        from src.core.engines.ali_engine import ODPSEngine
-        return ODPSEngine(settings.ALI_CREDENTIALS.get(region, {}).get("odps"))
-    elif engine_name == "holo":
-        from src.core.engines.ali_engine import HoloEngine
-        return HoloEngine(settings.ALI_CREDENTIALS.get(region, {}).get("holo"))
-    return None
-
 def parse_email_recipients(sql_content: str):
     """Parse email recipients from SQL file first line comment."""
     lines = sql_content.strip().split('\n')
@@ -39,6 +30,21 @@ def parse_email_recipients(sql_content: str):
         return [e for e in emails if '@' in e]
     return []
 
+def read_table(path):
+    """Loads a csv / parquet / feather / xlsx file into a DataFrame based on its extension."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv': return pd.read_csv(path)
+    if ext == '.parquet': return pd.read_parquet(path)
+    if ext in ('.feather', '.arrow'): return pd.read_feather(path)
+    return pd.read_excel(path)
+
+def parse_grid(spec: str):
+    """Scenario values: a comma-separated list ("0.9,1.0,1.2") or an evenly spaced range "start:stop:count"."""
+    if ':' in spec:
+        start, stop, count = spec.split(':')
+        return np.linspace(float(start), float(stop), int(count)).tolist()
+    return [float(v) for v in spec.split(',') if v.strip()]
+
 def display_preview(results, title="Data Preview"):
     df = None
     if isinstance(results, pd.DataFrame):
@@ -52,6 +58,7 @@ def display_preview(results, title="Data Preview"):
                     try:
                         if file_path.endswith('.csv'): df = pd.read_csv(file_path, nrows=10)
                         elif file_path.endswith('.xlsx'): df = pd.read_excel(file_path, nrows=10)
+                        elif file_path.endswith('.parquet'): df = read_table(file_path).head(10)
                     except: pass
             else:
                 headers = last_item.get("header", []) or last_item.get("headers", [])
@@ -75,7 +82,23 @@ def display_preview(results, title="Data Preview"):
     logger.info(f"[*] Stats: [bold]{len(df)}[/bold] rows and [bold]{len(df.columns)}[/bold] columns.")
     return True
 
+def display_batch_summary(summaries):
+    table = Table(title="Batch Summary", show_header=True, header_style="bold magenta")
+    table.add_column("Task")
+    table.add_column("Engine")
+    table.add_column("Region")
+    table.add_column("Status")
+    table.add_column("Wall Time", justify="right")
+
+    status_styles = {"success": "green", "failed": "red", "error": "bold red", "skipped": "dim"}
+    for s in summaries:
+        style = status_styles.get(s["status"], "")
+        table.add_row(s["name"], s["engine"], s["region"], f"[{style}]{s['status']}[/{style}]" if style else s["status"], f"{s['duration']:.1f}s")
+
+    console.print(table)
+
 def run_fetch_task(task_config, interactive=False):
+    """Runs one fetch task and returns the exported file paths (empty or None when nothing was exported)."""
     engine_name = task_config.get("engine", "ta")
     region = task_config.get("region", "global")
     sql_text = task_config.get("sql")
@@ -84,9 +107,10 @@ def run_fetch_task(task_config, interactive=False):
     task_name = task_config.get("name", f"{engine_name}_export")
     mailto = task_config.get("mailto")
     show_browser = task_config.get("show", False)
+    compression = task_config.get("compression")
 
     try:
-        engine = get_engine(engine_name, region)
+        engine = get_engine(engine_name, region, mode=task_config.get("ta_mode"))
         sql_content = sql_text
         file_recipients = []
         if not sql_content and sql_file:
@@ -106,47 +130,83 @@ def run_fetch_task(task_config, interactive=False):
             logger.error(f"SQL content not found.")
             return
 
-        logger.info(f"🚀 Fetching: {task_name}...")
-        if engine_name == "ta":
-            results = engine.fetch(sql_content, headless=not show_browser)
+        # Result cache (skipped with --no-cache, bypassed for reads with --refresh)
+        cache_ttl = task_config.get("cache_ttl", settings.CACHE_TTL)
+        cache_key = None
+        results = None
+        if cache_ttl and cache_ttl > 0 and not task_config.get("no_cache"):
+            cache_key = result_cache.make_key(engine_name, region, sql_content)
+            if not task_config.get("refresh"):
+                results = result_cache.get(
+                    cache_key, cache_ttl,
+                    stream=task_config.get("stream", False),
+                    chunk_size=task_config.get("chunk_size") or settings.ODPS_CHUNK_SIZE
+                )
+
+        if results is None:
+            logger.info(f"🚀 Fetching: {task_name}...")
+            if engine_name == "ta":
+                results = engine.fetch(sql_content, headless=not show_browser)
+            else:
+                results = engine.fetch(
+                    sql_content,
+                    stream=task_config.get("stream", False),
+                    chunk_size=task_config.get("chunk_size"),
+                    download_workers=task_config.get("download_workers"),
+                    holo_mode=task_config.get("holo_mode"),
+                    partition_column=task_config.get("partition_column"),
+                    partition_slices=task_config.get("partition_slices"),
+                    partition_workers=task_config.get("partition_workers"),
+                    filename_prefix=task_name
+                )
+            if cache_key:
+                results = result_cache.put(cache_key, results, engine_name=engine_name, region=region)
         else:
-            results = engine.fetch(sql_content)
+            logger.info(f"⚡ Using cached result for: {task_name}")
+
+        # Streaming engines hand back an iterator of DataFrame chunks
+        is_stream = isinstance(results, Iterator)
+        if is_stream:
+            preview_chunk, results = peek_chunks(results)
 
         if results is not None:
             final_file_paths = []
             if interactive:
-                display_preview(results)
+                display_preview(preview_chunk if is_stream else results)
                 if console.input("\n[?] Download? (y/n, default y): ").lower().strip() == 'n': return
                 
                 custom_name = console.input(f"[?] File prefix (Default: '{task_name}'): ").strip()
                 if custom_name: task_name = custom_name
 
-                console.print("\n[?] Select Format:\n  1. Excel (.xlsx)\n  2. CSV (.csv)\n  3. Text (.txt)\n  4. All formats")
+                console.print("\n[?] Select Format:\n  1. Excel (.xlsx)\n  2. CSV (.csv)\n  3. Text (.txt)\n  4. All formats\n  5. Parquet (.parquet)\n  6. Feather (.feather)")
                 choice = console.input(">> ").strip()
                 if choice == '1': formats = ['xlsx']
                 elif choice == '2': formats = ['csv']
                 elif choice == '3': formats = ['txt']
                 elif choice == '4': formats = ['xlsx', 'csv', 'txt']
+                elif choice == '5': formats = ['parquet']
+                elif choice == '6': formats = ['feather']
 
             # Handle TA Direct Download
             if isinstance(results, list) and len(results) > 0 and isinstance(results[0], dict) and results[0].get("type") == "file":
                 original_file = results[0].get("file_path")
                 try:
-                    df_tmp = pd.read_csv(original_file)
-                    final_file_paths = export_data(df_tmp, filename_prefix=task_name, formats=formats)
-                    os.remove(original_file)
-                except:
+                    final_file_paths = export_file(original_file, filename_prefix=task_name, formats=formats, compression=compression)
+                except Exception as e:
+                    logger.error(f"Could not convert downloaded file, keeping it as-is: {e}")
                     final_file_paths = [original_file]
+            elif is_stream:
+                final_file_paths = export_chunks(results, filename_prefix=task_name, formats=formats, compression=compression)
             else:
-                final_file_paths = export_data(results, filename_prefix=task_name, formats=formats)
+                final_file_paths = export_data(results, filename_prefix=task_name, formats=formats, compression=compression)
 
             # Email logic
             recipient_str = mailto or ",".join(file_recipients)
             if recipient_str and final_file_paths:
                 recipients = [r.strip() for r in recipient_str.split(",") if "@" in r]
                 send_emails(recipients, f"Data Report: {task_name}", f"Task: {task_name} finished at {datetime.now()}", final_file_paths)
-                
-        return results
+            return final_file_paths
+        return []
     except Exception as e:
         logger.error(f"Fetch error: {e}")
 
@@ -167,13 +227,43 @@ def run_predict_task(args):
     try:
         from src.core.services.analytics.validator import DataValidator
         logger.info(f"🔮 Predicting {model_type.upper()}...")
-        df_input = pd.read_csv(input_path) if input_path.endswith('.csv') else pd.read_excel(input_path)
+        df_input = read_table(input_path)
         
-        if model_type == "ltv":
-            from src.core.services.analytics.ltv_service import LTVService
+        state_path = None
+        if model_type == "ltv" and args.state:
+            from src.core.services.analytics.ltv_service import load_ltv_states
+            state_name = args.state if args.state.endswith(".json") else f"{args.state}.json"
+            state_path = os.path.join(settings.STATE_DIR, state_name)
+            states = load_ltv_states(state_path)
+            logger.info(f"LTV state: {len(states)} cohorts loaded from {state_path}")
+
+        if model_type == "ltv" and args.cohort_keys:
+            from src.core.services.analytics.ltv_service import LTVBatchService, save_ltv_states
+            cohort_keys = [k.strip() for k in args.cohort_keys.split(",") if k.strip()]
+            df_clean = DataValidator.clean_ltv_cohort_data(df_input, cohort_keys)
+            service = LTVBatchService(df_clean, cohort_keys, fit_method=args.fit, bootstrap=args.bootstrap, seed=args.seed)
+            result_df = service.predict(ecpnu=ecpnu, net_rate=net_rate, workers=args.workers or 1, states=states if state_path else None)
+            if state_path:
+                save_ltv_states(state_path, {**states, **service.states})
+            benchmarks = service.get_summary_benchmarks()
+            display_preview(benchmarks, title="LTV Benchmarks")
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            export_data(result_df, filename_prefix=f"LTV_Cohort_Report_{timestamp}", formats=["xlsx"], output_dir=settings.OUTPUT_DIR)
+            export_data(benchmarks, filename_prefix=f"LTV_Cohort_Benchmarks_{timestamp}", formats=["xlsx"], output_dir=settings.OUTPUT_DIR)
+
+        elif model_type == "ltv":
+            from src.core.services.analytics.ltv_service import LTVService, save_ltv_states, SINGLE_COHORT_STATE
             df_clean = DataValidator.clean_ltv_data(df_input)
-            service = LTVService(df_clean)
-            result_df = service.predict(ecpnu=ecpnu, net_rate=net_rate)
+            service = LTVService(df_clean, fit_method=args.fit, bootstrap=args.bootstrap, seed=args.seed)
+            if state_path and SINGLE_COHORT_STATE in states:
+                result_df = service.update(states[SINGLE_COHORT_STATE], ecpnu=ecpnu, net_rate=net_rate)
+            else:
+                result_df = service.predict(ecpnu=ecpnu, net_rate=net_rate)
+            if state_path:
+                save_ltv_states(state_path, {SINGLE_COHORT_STATE: service.state})
+            if service.fit_metrics:
+                m = service.fit_metrics
+                logger.info(f"Retention fit ({m['method']}): {'converged' if m['converged'] else 'not converged'}, {m['fit_seconds'] * 1000:.1f} ms")
             benchmarks = service.get_summary_benchmarks()
             display_preview(benchmarks, title="LTV Benchmarks")
             export_name = f"LTV_Report_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
@@ -183,9 +273,17 @@ def run_predict_task(args):
             from src.core.services.analytics.mau_service import MAUService
             df_clean = DataValidator.clean_mau_data(df_input)
             service = MAUService(df_clean)
-            result_df = service.predict(months_to_predict=args.months, growth_factor=args.growth)
-            display_preview(result_df.tail(15), title="MAU Forecast")
-            export_name = f"MAU_Report_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            if args.growth_grid or args.retention_grid:
+                growth = parse_grid(args.growth_grid) if args.growth_grid else [args.growth]
+                retention = parse_grid(args.retention_grid) if args.retention_grid else [args.retention]
+                result_df = service.sweep(growth, retention, months_to_predict=args.months)
+                final = result_df.groupby('scenario').tail(1).sort_values('mau', ascending=False)
+                display_preview(final.head(15), title=f"MAU Scenarios (month {args.months}, top 15 of {len(final)})")
+                export_name = f"MAU_Scenarios_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            else:
+                result_df = service.predict(months_to_predict=args.months, growth_factor=args.growth, retention_factor=args.retention)
+                display_preview(result_df.tail(15), title="MAU Forecast")
+                export_name = f"MAU_Report_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
             export_data(result_df, filename_prefix=export_name, formats=["xlsx"], output_dir=settings.OUTPUT_DIR)
 
     except Exception as e:
@@ -203,6 +301,10 @@ def main():
     fetch_parser.add_argument("--interactive", action="store_true", default=False)
     fetch_parser.add_argument("--show", action="store_true", default=False, help="Show browser (TA only)")
     fetch_parser.add_argument("--mailto", help="Comma separated emails")
+    fetch_parser.add_argument("--no-cache", action="store_true", default=False, help="Bypass the local result cache")
+    fetch_parser.add_argument("--refresh", action="store_true", default=False, help="Re-run the query and overwrite the cached result")
+    fetch_parser.add_argument("--parallel", action="store_true", default=False, help="Run --task entries concurrently")
+    fetch_parser.add_argument("--workers", type=int, help="Worker pool size for --parallel (default: BATCH_WORKERS)")
 
     predict_parser = subparsers.add_parser("predict", help="Run analytics models")
     predict_parser.add_argument("model", choices=["ltv", "mau"])
@@ -211,6 +313,15 @@ def main():
     predict_parser.add_argument("--net_rate", type=float, default=0.35)
     predict_parser.add_argument("--months", type=int, default=12, help="For MAU: Months to forecast")
     predict_parser.add_argument("--growth", type=float, default=1.0, help="For MAU: Growth factor for NUU")
+    predict_parser.add_argument("--retention", type=float, default=1.0, help="For MAU: Multiplier for the new/old/returning retention rates")
+    predict_parser.add_argument("--growth-grid", help="For MAU: scenario sweep over growth factors, '0.8,1.0,1.2' or 'start:stop:count'")
+    predict_parser.add_argument("--retention-grid", help="For MAU: scenario sweep over retention multipliers (combined with every growth factor)")
+    predict_parser.add_argument("--cohort-keys", help="For LTV: comma-separated cohort columns (e.g. channel,country,install_week) to predict every cohort of a long-format table")
+    predict_parser.add_argument("--fit", choices=["refine", "loglog"], default="refine", help="For LTV: retention fit; refine = curve_fit warm-started from the closed-form log-log fit, loglog = closed form only")
+    predict_parser.add_argument("--bootstrap", type=int, default=0, help="For LTV: bootstrap replicates for P10/P50/P90 LTV bands (e.g. 1000; default: off)")
+    predict_parser.add_argument("--seed", type=int, help="For LTV: random seed of the bootstrap")
+    predict_parser.add_argument("--state", help="For LTV: name of a state file in data/state/; cohorts found there only process the days added since the last run, and the file is updated")
+    predict_parser.add_argument("--workers", type=int, help="For LTV cohorts: processes to spread the cohorts over (default: 1)")
 
     parser.add_argument("--login", action="store_true")
 
@@ -231,7 +342,14 @@ def main():
             if os.path.exists(task_path):
                 with open(task_path, 'r', encoding='utf-8') as f:
                     tasks = json.load(f)
-                    for t in (tasks if isinstance(tasks, list) else [tasks]):
+                tasks = tasks if isinstance(tasks, list) else [tasks]
+                tasks = [{**t, "no_cache": args.no_cache or t.get("no_cache", False), "refresh": args.refresh or t.get("refresh", False)} for t in tasks]
+                if args.parallel:
+                    from src.core.executor import BatchExecutor
+                    summaries = BatchExecutor(run_fetch_task, max_workers=args.workers).run(tasks)
+                    display_batch_summary(summaries)
+                else:
+                    for t in tasks:
                         if t.get("paused", False):
                             logger.info(f"⏭  Skipping paused task: {t.get('name', 'Unknown')}")
                             continue
@@ -239,7 +357,8 @@ def main():
         else:
             # Single CLI runs (ad-hoc) are interactive by default
             run_fetch_task(vars(args), interactive=True)
-            
+        result_cache.log_stats()
+
     elif args.command == "predict":
         run_predict_task(args)
     else:
@@ -22,6 +22,11 @@ class TAConfig:
     sql_url: str = ""
     user: str = ""
     password: str = ""
+    # "browser" drives the IDE UI, "http" calls the IDE endpoints directly
+    mode: str = "browser"
+    api_submit_path: str = "api/ide/query/submit"
+    api_status_path: str = "api/ide/query/status"
+    api_download_path: str = "api/ide/query/download"
 
 class Settings:
     # --- AliCloud Credentials ---
@@ -68,17 +73,64 @@ class Settings:
             url=os.getenv("TA_URL_CN", "https://your-ta-china-url.com/"),
             sql_url=os.getenv("TA_SQL_URL_CN", "https://your-ta-china-url.com/#/tga/ide/-1"),
             user=os.getenv("TA_USER_CN", ""),
-            password=os.getenv("TA_PASS_CN", "")
+            password=os.getenv("TA_PASS_CN", ""),
+            mode=os.getenv("TA_MODE_CN", os.getenv("TA_MODE", "browser")),
+            api_submit_path=os.getenv("TA_API_SUBMIT_PATH", "api/ide/query/submit"),
+            api_status_path=os.getenv("TA_API_STATUS_PATH", "api/ide/query/status"),
+            api_download_path=os.getenv("TA_API_DOWNLOAD_PATH", "api/ide/query/download")
         ),
         'global': TAConfig(
             url=os.getenv("TA_URL_GLOBAL", "https://your-ta-global-url.com/"),
             sql_url=os.getenv("TA_SQL_URL_GLOBAL", "https://your-ta-global-url.com/#/tga/ide/-1"),
             user=os.getenv("TA_USER_GLOBAL", ""),
-            password=os.getenv("TA_PASS_GLOBAL", "")
+            password=os.getenv("TA_PASS_GLOBAL", ""),
+            mode=os.getenv("TA_MODE_GLOBAL", os.getenv("TA_MODE", "browser")),
+            api_submit_path=os.getenv("TA_API_SUBMIT_PATH", "api/ide/query/submit"),
+            api_status_path=os.getenv("TA_API_STATUS_PATH", "api/ide/query/status"),
+            api_download_path=os.getenv("TA_API_DOWNLOAD_PATH", "api/ide/query/download")
         )
     }
     
     TA_SESSION_DIR = os.path.abspath(os.getenv("USER_DATA_DIR", "./ta_session"))
+    # 浏览器登录后导出的 Cookie, 供 HTTP 模式直接调用 IDE 接口
+    TA_COOKIE_FILE = os.path.join(TA_SESSION_DIR, "ta_cookies.json")
+    # 共享浏览器中为每个 IDE 地址预热的标签页数量
+    TA_TAB_POOL_SIZE = int(os.getenv("TA_TAB_POOL_SIZE", "2"))
+    # 等待空闲标签页 / 单个查询 (含下载) 的超时秒数, 超时后任务报错而不是一直挂起
+    TA_TAB_WAIT_TIMEOUT = int(os.getenv("TA_TAB_WAIT_TIMEOUT", "3900"))
+    TA_QUERY_TIMEOUT = int(os.getenv("TA_QUERY_TIMEOUT", "3900"))
+
+    # --- Streaming Download Config ---
+    # 流式下载 (task 中 "stream": true) 时每个分块的行数
+    ODPS_CHUNK_SIZE = int(os.getenv('ODPS_CHUNK_SIZE', '100000'))
+    # 并行下载 ODPS 结果时的 tunnel reader 数量 (task 中 "download_workers" 可覆盖)
+    ODPS_DOWNLOAD_WORKERS = int(os.getenv('ODPS_DOWNLOAD_WORKERS', '1'))
+
+    # Hologres 服务端游标每次拉取的行数 (task 中 "chunk_size" 可覆盖)
+    HOLO_ITERSIZE = int(os.getenv('HOLO_ITERSIZE', '50000'))
+
+    # Hologres 连接池: 每个区域最多保持的连接数, 以及空闲多久 (秒) 后关闭
+    HOLO_POOL_SIZE = int(os.getenv('HOLO_POOL_SIZE', '8'))
+    HOLO_POOL_IDLE_TIMEOUT = int(os.getenv('HOLO_POOL_IDLE_TIMEOUT', '300'))
+
+    # --- Export Config ---
+    # parquet 默认压缩算法 (snappy / zstd / gzip / lz4 / none), task 中 "compression" 可覆盖
+    PARQUET_COMPRESSION = os.getenv('PARQUET_COMPRESSION', 'snappy')
+
+    # --- Batch Execution Config ---
+    # 并行批量模式下的线程池大小
+    BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', '8'))
+    # 每个引擎同时运行的任务上限 (TA 任务共享同一个浏览器, 受 TA_TAB_POOL_SIZE 限制)
+    ENGINE_CONCURRENCY = {
+        'odps': int(os.getenv('MAX_CONCURRENCY_ODPS', '8')),
+        'holo': int(os.getenv('MAX_CONCURRENCY_HOLO', '4')),
+        'ta': int(os.getenv('MAX_CONCURRENCY_TA', '2')),
+    }
+    # 每个区域同时运行的任务上限 (跨引擎)
+    REGION_CONCURRENCY = {
+        'china': int(os.getenv('MAX_CONCURRENCY_CN', '8')),
+        'global': int(os.getenv('MAX_CONCURRENCY_GLOBAL', '8')),
+    }
 
     # --- Data & Task Path Config ---
     BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -89,6 +141,13 @@ class Settings:
     EXPORT_DIR = OUTPUT_DIR 
     REPORT_DIR = OUTPUT_DIR 
     
+    # 查询结果缓存 (Parquet), 默认有效期 (秒, 0 为关闭) 与总容量上限 (MB)
+    CACHE_DIR = os.path.join(DATA_DIR, "cache")
+    CACHE_TTL = int(os.getenv('CACHE_TTL', '3600'))
+    CACHE_MAX_MB = int(os.getenv('CACHE_MAX_MB', '2048'))
+    # 增量 LTV 预测的持久化状态 (拟合参数与累计 ARPU/误差)
+    STATE_DIR = os.path.join(DATA_DIR, "state")
+
     TASKS_DIR = os.path.join(BASE_DIR, "tasks")
     TEMPLATES_DIR = os.path.join(TASKS_DIR, "templates")
     CONFIGS_DIR = os.path.join(TASKS_DIR, "configs")
@@ -105,7 +164,7 @@ class Settings:
     def __post_init__(self):
         # 确保目录存在
         dirs_to_create = [
-            self.INPUT_DIR, self.OUTPUT_DIR,
+            self.INPUT_DIR, self.OUTPUT_DIR, self.CACHE_DIR, self.STATE_DIR,
             self.TEMPLATES_DIR, self.CONFIGS_DIR, self.JOBS_DIR,
             self.PREDICT_INPUT_DIR, self.TA_SESSION_DIR
         ]
@@ -1,4 +1,15 @@
+import os
+import time
+import uuid
+import threading
+import shutil
+import numbers
 import pandas as pd
+from datetime import date, datetime
+from typing import Iterator, Union, List, Dict
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, ExitStack
 from odps import ODPS
 from src.core.engines.base_engine import BaseEngine
 from src.config import settings, DBConfig
@@ -7,24 +18,188 @@ from src.utils.logger import logger
 class ODPSEngine(BaseEngine):
     def __init__(self, config: DBConfig):
         self.config = config
+        self._client = None
+        self._client_lock = threading.Lock()
 
-    def fetch(self, sql: str, **kwargs) -> pd.DataFrame:
-        logger.info(f"Connecting to ODPS Project: {self.config.project}...")
-        o = ODPS(
-            self.config.access_id, 
-            self.config.access_key, 
-            self.config.project, 
-            endpoint=self.config.endpoint
-        )
+    @property
+    def client(self) -> ODPS:
+        """ODPS client built once per engine, so consecutive tasks reuse its HTTP session."""
+        with self._client_lock:
+            if self._client is None:
+                logger.info(f"Connecting to ODPS Project: {self.config.project}...")
+                self._client = ODPS(
+                    self.config.access_id,
+                    self.config.access_key,
+                    self.config.project,
+                    endpoint=self.config.endpoint
+                )
+            return self._client
+
+    def fetch(self, sql: str, **kwargs) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
+        o = self.client
         hints = {"odps.sql.submit.mode": "script"}
-        with o.execute_sql(sql, hints=hints).open_reader() as reader:
+        instance = o.execute_sql(sql, hints=hints)
+        workers = max(1, int(kwargs.get("download_workers") or settings.ODPS_DOWNLOAD_WORKERS))
+        if kwargs.get("stream"):
+            return self._iter_chunks(instance, kwargs.get("chunk_size") or settings.ODPS_CHUNK_SIZE, workers)
+        if workers > 1:
+            with instance.open_reader(tunnel=True) as reader:
+                total = reader.count
+            if total > 0:
+                # One range per worker, downloaded concurrently and concatenated in order
+                return pd.concat(self._iter_chunks(instance, -(-total // workers), workers), ignore_index=True)
+        with instance.open_reader() as reader:
             return reader.to_pandas()
 
+    def _iter_chunks(self, instance, chunk_size, workers=1):
+        """
+        Yields the instance result as DataFrame chunks read through the instance tunnel,
+        so memory use is bounded by chunk_size rather than the result size.
+        The serial path reads every range from one tunnel reader. With workers > 1, up to
+        `workers` ranges are downloaded concurrently, each worker thread over its own
+        reader, and still yielded in order.
+        """
+        with instance.open_reader(tunnel=True) as reader:
+            total = reader.count
+            ranges = [(start, min(chunk_size, total - start)) for start in range(0, total, chunk_size)]
+            logger.info(f"Streaming {total:,} rows in {len(ranges)} chunks of {chunk_size:,} ({workers} readers)...")
+            if workers == 1:
+                for start, count in ranges:
+                    yield reader.to_pandas(start=start, count=count)
+                return
+
+        # One download session per worker thread, opened on its first range
+        local = threading.local()
+        readers = ExitStack()
+        readers_lock = threading.Lock()
+
+        def read_range(start, count):
+            if getattr(local, "reader", None) is None:
+                with readers_lock:
+                    local.reader = readers.enter_context(instance.open_reader(tunnel=True))
+            return local.reader.to_pandas(start=start, count=count)
+
+        with readers, ThreadPoolExecutor(max_workers=workers, thread_name_prefix="odps-tunnel") as pool:
+            in_flight = deque()
+            try:
+                for start, count in ranges:
+                    in_flight.append(pool.submit(read_range, start, count))
+                    if len(in_flight) >= workers:
+                        yield in_flight.popleft().result()
+                while in_flight:
+                    yield in_flight.popleft().result()
+            finally:
+                for future in in_flight:
+                    future.cancel()
+
+class HoloConnectionPool:
+    """
+    Bounded, thread-safe psycopg2 connection pool.
+    Idle connections are health-checked before reuse and closed once they
+    have been idle longer than idle_timeout.
+    """
+    def __init__(self, connect, max_size=8, idle_timeout=300, check_after=30):
+        self._connect = connect
+        self.max_size = max(1, max_size)
+        self.idle_timeout = idle_timeout
+        self.check_after = check_after
+        self._idle = []  # [(conn, last_used)], most recently used last
+        self._in_use = 0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    def _acquire(self):
+        with self._cond:
+            while True:
+                self._evict_idle()
+                if self._idle or self._in_use < self.max_size:
+                    break
+                self._cond.wait()
+            conn, last_used = self._idle.pop() if self._idle else (None, None)
+            self._in_use += 1
+
+        try:
+            if conn is not None and not self._is_healthy(conn, last_used):
+                logger.info("Discarding stale Hologres connection.")
+                self._close_quietly(conn)
+                conn = None
+            return conn if conn is not None else self._connect()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def _release(self, conn):
+        try:
+            # Ends any open transaction (e.g. from a named cursor or a failed query)
+            if not conn.closed:
+                conn.rollback()
+        except Exception:
+            self._close_quietly(conn)
+
+        with self._cond:
+            self._in_use -= 1
+            if not conn.closed:
+                self._idle.append((conn, time.time()))
+            self._cond.notify()
+
+    def _is_healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        if time.time() - last_used < self.check_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _evict_idle(self):
+        now = time.time()
+        keep = []
+        for conn, last_used in self._idle:
+            if now - last_used > self.idle_timeout:
+                self._close_quietly(conn)
+            else:
+                keep.append((conn, last_used))
+        self._idle = keep
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close(self):
+        with self._cond:
+            for conn, _ in self._idle:
+                self._close_quietly(conn)
+            self._idle = []
+
 class HoloEngine(BaseEngine):
     def __init__(self, config: DBConfig):
         self.config = config
+        self.pool = HoloConnectionPool(
+            self._connect,
+            max_size=settings.HOLO_POOL_SIZE,
+            idle_timeout=settings.HOLO_POOL_IDLE_TIMEOUT
+        )
+
+    def close(self):
+        self.pool.close()
 
-    def fetch(self, sql: str, **kwargs) -> pd.DataFrame:
+    def _connect(self):
         try:
             import psycopg2
         except ImportError:
@@ -32,14 +207,180 @@ class HoloEngine(BaseEngine):
             raise
 
         logger.info(f"Connecting to Hologres: {self.config.host}...")
-        conn = psycopg2.connect(
-            host=self.config.host, 
+        return psycopg2.connect(
+            host=self.config.host,
             port=self.config.port,
-            dbname=self.config.dbname, 
+            dbname=self.config.dbname,
             user=self.config.user,
             password=self.config.password
         )
-        try:
+
+    def fetch(self, sql: str, **kwargs) -> Union[pd.DataFrame, Iterator[pd.DataFrame], List[Dict]]:
+        """
+        holo_mode="copy" streams COPY ... TO STDOUT straight into a CSV file and returns a
+        file result; stream=True reads through a named server-side cursor in chunks.
+        Otherwise the whole result is loaded with pd.read_sql.
+        With partition_column/partition_slices the query is split into key ranges
+        that are extracted concurrently on separate connections.
+        """
+        if kwargs.get("partition_column") and int(kwargs.get("partition_slices") or 1) > 1:
+            return self._fetch_partitioned(sql, **kwargs)
+        if kwargs.get("holo_mode") == "copy":
+            return [self._copy_to_file(sql, kwargs.get("filename_prefix") or "holo_export")]
+        if kwargs.get("stream"):
+            return self._iter_chunks(sql, kwargs.get("chunk_size") or settings.HOLO_ITERSIZE)
+        return self._read_frame(sql)
+
+    def _read_frame(self, sql):
+        with self.pool.connection() as conn:
             return pd.read_sql(sql, conn)
+
+    def _copy(self, sql, f, header=True):
+        copy_sql = f"COPY ({sql.strip().rstrip(';')}) TO STDOUT WITH (FORMAT csv, HEADER {'true' if header else 'false'})"
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            cur.copy_expert(copy_sql, f, size=1024 * 1024)
+
+    def _copy_to_file(self, sql, filename_prefix, queries=None, workers=1):
+        """
+        Runs the query through COPY and writes the CSV stream directly to disk.
+        When `queries` (key-range slices of `sql`) are given, each slice is copied
+        to its own part file concurrently and the parts are joined in order.
+        """
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        file_path = os.path.join(settings.OUTPUT_DIR, f"{filename_prefix}_{timestamp}_copy.csv")
+        part_paths = []
+        try:
+            if not queries:
+                with open(file_path, 'wb') as f:
+                    logger.info("Streaming result via COPY TO STDOUT...")
+                    self._copy(sql, f)
+            else:
+                part_paths = [f"{file_path}.part{i}" for i in range(len(queries))]
+
+                def copy_part(i):
+                    with open(part_paths[i], 'wb') as f:
+                        self._copy(queries[i], f, header=(i == 0))
+
+                logger.info(f"Streaming {len(queries)} slices via COPY TO STDOUT ({workers} connections)...")
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="holo-copy") as pool:
+                    list(pool.map(copy_part, range(len(queries))))
+                with open(file_path, 'wb') as out:
+                    for part in part_paths:
+                        with open(part, 'rb') as f:
+                            shutil.copyfileobj(f, out, length=1024 * 1024)
+        except Exception:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            raise
         finally:
-            conn.close()
+            for part in part_paths:
+                if os.path.exists(part):
+                    os.remove(part)
+
+        logger.info(f"COPY finished: {file_path} ({os.path.getsize(file_path) / 1024 / 1024:.1f} MB)")
+        return {"file_path": file_path, "type": "file"}
+
+    def _iter_chunks(self, sql, itersize):
+        """
+        Yields DataFrame chunks from a named (server-side) cursor, so only
+        `itersize` rows are held on the client at a time.
+        """
+        with self.pool.connection() as conn, conn.cursor(name=f"fcdc_{uuid.uuid4().hex}") as cur:
+            cur.itersize = itersize
+            cur.execute(sql)
+            logger.info(f"Streaming result via server-side cursor (itersize={itersize:,})...")
+            columns = None
+            while True:
+                rows = cur.fetchmany(itersize)
+                if columns is None:
+                    columns = [desc[0] for desc in cur.description]
+                if not rows:
+                    break
+                yield pd.DataFrame(rows, columns=columns)
+
+    def _slice_queries(self, sql, column, slices):
+        """
+        Splits the query into range predicates on `column` (numeric, date/datetime or a
+        'YYYY-MM-DD' / 'YYYYMMDD' string), ordered by key, plus a final slice for NULLs.
+        """
+        base = sql.strip().rstrip(';')
+        col = '"' + column.replace('"', '""') + '"'
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            cur.execute(f"SELECT min({col}), max({col}) FROM ({base}) AS _src")
+            lo, hi = cur.fetchone()
+            if lo is None:
+                return [base]
+
+            bounds = _split_range(lo, hi, slices)
+            # mogrify treats % as a placeholder marker, so escape the user's SQL first
+            escaped = base.replace('%', '%%')
+            queries = []
+            for i in range(len(bounds) - 1):
+                op = "<=" if i == len(bounds) - 2 else "<"
+                queries.append(cur.mogrify(
+                    f"SELECT * FROM ({escaped}) AS _src WHERE {col} >= %s AND {col} {op} %s",
+                    (bounds[i], bounds[i + 1])
+                ).decode())
+            queries.append(f"SELECT * FROM ({base}) AS _src WHERE {col} IS NULL")
+
+        logger.info(f"Partitioned on {column} into {len(queries) - 1} ranges [{lo} .. {hi}] + NULL slice.")
+        return queries
+
+    def _fetch_partitioned(self, sql, **kwargs):
+        queries = self._slice_queries(sql, kwargs["partition_column"], int(kwargs["partition_slices"]))
+        workers = max(1, min(len(queries), int(kwargs.get("partition_workers") or len(queries))))
+
+        if kwargs.get("holo_mode") == "copy":
+            return [self._copy_to_file(sql, kwargs.get("filename_prefix") or "holo_export", queries=queries, workers=workers)]
+        if kwargs.get("stream"):
+            return self._iter_slices(queries, workers)
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="holo-slice") as pool:
+            frames = list(pool.map(self._read_frame, queries))
+        return pd.concat(frames, ignore_index=True)
+
+    def _iter_slices(self, queries, workers):
+        """Yields one DataFrame per slice, in key order, with at most `workers` slices in flight."""
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="holo-slice") as pool:
+            in_flight = deque()
+            try:
+                for query in queries:
+                    in_flight.append(pool.submit(self._read_frame, query))
+                    if len(in_flight) >= workers:
+                        yield in_flight.popleft().result()
+                while in_flight:
+                    yield in_flight.popleft().result()
+            finally:
+                for future in in_flight:
+                    future.cancel()
+
+def _split_range(lo, hi, slices):
+    """
+    Returns ascending boundaries [lo, ..., hi] cutting the closed range into at most
+    `slices` pieces. The last piece is meant to be closed on both ends.
+    """
+    if isinstance(lo, str):
+        for fmt in ("%Y-%m-%d", "%Y%m%d"):
+            try:
+                lo_d, hi_d = datetime.strptime(lo, fmt).date(), datetime.strptime(hi, fmt).date()
+            except ValueError:
+                continue
+            return [b.strftime(fmt) for b in _split_range(lo_d, hi_d, slices)]
+        raise ValueError(f"Cannot partition on string values like '{lo}'; use a numeric or date column.")
+
+    if isinstance(lo, datetime):
+        bounds = [lo + (hi - lo) * i / slices for i in range(slices)]
+    elif isinstance(lo, date):
+        bounds = [date.fromordinal(o) for o in _split_range(lo.toordinal(), hi.toordinal(), slices)[:-1]]
+    elif isinstance(lo, int) and not isinstance(lo, bool):
+        step = max(1, -(-(hi - lo + 1) // slices))
+        bounds = list(range(lo, hi + 1, step))
+    elif isinstance(lo, numbers.Number):
+        bounds = [lo + (hi - lo) * i / slices for i in range(slices)]
+    else:
+        raise ValueError(f"Unsupported partition column type: {type(lo).__name__}")
+
+    bounds = sorted(set(bounds))
+    if bounds[-1] != hi or len(bounds) == 1:
+        bounds.append(hi)
+    return bounds
@@ -1,14 +1,23 @@
 from abc import ABC, abstractmethod
 import pandas as pd
-from typing import Union, List, Dict
+from typing import Union, List, Dict, Iterator
 
 class BaseEngine(ABC):
     """
     Abstract Base Class for all data extraction engines.
     """
     @abstractmethod
-    def fetch(self, sql: str, **kwargs) -> Union[pd.DataFrame, List[Dict]]:
+    def fetch(self, sql: str, **kwargs) -> Union[pd.DataFrame, List[Dict], Iterator[pd.DataFrame]]:
         """
         Execute SQL and return data.
+        Engines that support streaming return an iterator of DataFrame chunks
+        when called with stream=True.
+        """
+        pass
+
+    def close(self):
+        """
+        Release pooled clients/connections. Engines are long-lived and shared
+        across tasks, so this is only called at process exit.
         """
         pass
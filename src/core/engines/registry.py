@@ -0,0 +1,50 @@
+import atexit
+import threading
+from src.config import settings
+from src.utils.logger import logger
+
+_engines = {}
+_lock = threading.Lock()
+
+def _create_engine(engine_name, region, mode):
+    if engine_name == "ta":
+        config = settings.TA_CREDENTIALS.get(region)
+        if mode == "http":
+            from src.core.engines.ta_http_engine import ThinkingDataHttpEngine
+            return ThinkingDataHttpEngine(config)
+        from src.core.engines.ta_engine import ThinkingDataEngine
+        return ThinkingDataEngine(config)
+    elif engine_name == "odps":
+        from src.core.engines.ali_engine import ODPSEngine
+        return ODPSEngine(settings.ALI_CREDENTIALS.get(region, {}).get("odps"))
+    elif engine_name == "holo":
+        from src.core.engines.ali_engine import HoloEngine
+        return HoloEngine(settings.ALI_CREDENTIALS.get(region, {}).get("holo"))
+    return None
+
+def get_engine(engine_name, region="global", mode=None):
+    """
+    Returns the process-wide engine for an engine/region pair, creating it on first use.
+    Engines keep their ODPS client, Hologres connection pool or browser session warm,
+    so consecutive tasks against the same region skip the connection handshake.
+    """
+    if engine_name == "ta":
+        mode = mode or settings.TA_CREDENTIALS.get(region).mode
+    key = (engine_name, region, mode)
+    with _lock:
+        if key not in _engines:
+            engine = _create_engine(engine_name, region, mode)
+            if engine is None:
+                return None
+            _engines[key] = engine
+        return _engines[key]
+
+@atexit.register
+def close_engines():
+    with _lock:
+        for (engine_name, region, _), engine in _engines.items():
+            try:
+                engine.close()
+            except Exception as e:
+                logger.warning(f"Failed to close {engine_name} engine ({region}): {e}")
+        _engines.clear()
@@ -1,251 +1,508 @@
 import os
+import re
 import time
-from playwright.sync_api import sync_playwright
+import uuid
+import atexit
+import asyncio
+import threading
+import concurrent.futures
+from playwright.async_api import async_playwright
 from src.core.engines.base_engine import BaseEngine
 from src.utils.logger import logger
 from src.config import settings
 
-class ThinkingDataEngine(BaseEngine):
+EDITOR_SELECTOR = ".monaco-editor, .CodeMirror, .ace_editor, textarea"
+TA_DOWNLOAD_SELECTOR = ", ".join(f"{sel}:visible" for sel in [
+    'button:has-text("Download All")', 'button:has-text("全量下载")', '.ant-btn:has-text("全量下载")',
+    'span:has-text("全量下载")', '.anticon-download', '.anticon-export', '.ide-download-btn'
+])
+TA_STATUS_SELECTOR = ".ant-tabs-tabpane-active, .ide-results-area"
+TA_SPINNER_SELECTOR = ".ant-spin-spinning, .ant-progress-circle, .ant-spin"
+TA_CALC_SELECTOR = 'button:has-text("Calculate"), button:has-text("计算"), .ant-btn:has-text("计算")'
+TA_ERROR_PATTERN = re.compile(r"java\.sql\.SQLException|Parse exception|Error|mismatched input|cannot be resolved")
+TA_RUNNING_MARKERS = ["查询引擎运行中", "已进行", "查询结果处理中", "处理中", "Executing", "100%"]
+TA_FAILED_STATUSES = {"failed", "fail", "error", "cancelled", "canceled", "killed"}
+# Seconds to wait after the spinner disappears before declaring the IDE idle
+TA_IDLE_GRACE = 5
+# When several signals fire together, prefer the one carrying data
+TA_OUTCOME_PRIORITY = ["data", "download", "error", "idle"]
+# Put on a tab pool when a broken tab is dropped, so a waiter wakes up and opens a new one
+_TAB_DROPPED = object()
+
+class TASession:
     """
-    Engine for ThinkingData platform using Playwright automation.
-    Logic fully synchronized with optimized backup version.
+    Long-lived Playwright runtime shared by every TA query in the process.
+    Owns a single persistent Chromium context on a background event loop and
+    hands out logged-in, pre-warmed IDE tabs (one pool per IDE url).
     """
-    def __init__(self, config):
-        self.config = config
-        self.base_url = config.url
-        self.sql_url = config.sql_url
-        self.username = config.user
-        self.password = config.password
-        self.user_data_dir = settings.TA_SESSION_DIR
+    def __init__(self, user_data_dir, headless=True, pool_size=2):
+        self.user_data_dir = user_data_dir
+        self.headless = headless
+        self.pool_size = max(1, pool_size)
+        # Set by get_session; see release_session
+        self.temporary = False
+        self._pools = {}
+        self._opened = {}
+        # Background tab resets, referenced so they are not garbage collected mid-flight
+        self._releases = set()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="ta-session", daemon=True)
+        self.thread.start()
+        self._call(self._start())
 
-    def login(self, headless=False):
-        if not self.username or not self.password:
-            logger.error("TA credentials missing.")
-            return
+    def _call(self, coro, timeout=None):
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            # Cancelling the task also releases its tab
+            future.cancel()
+            raise TimeoutError(f"TA browser session did not answer within {timeout}s")
+
+    async def _start(self):
+        logger.info(f"Starting TA browser session (headless={self.headless}, tabs={self.pool_size})...")
+        self._playwright = await async_playwright().start()
+        self.context = await self._playwright.chromium.launch_persistent_context(
+            self.user_data_dir,
+            headless=self.headless,
+            permissions=["clipboard-read", "clipboard-write"]
+        )
 
-        with sync_playwright() as p:
-            context = p.chromium.launch_persistent_context(
-                self.user_data_dir,
-                headless=headless,
-                slow_mo=100,
-                permissions=["clipboard-read", "clipboard-write"]
-            )
-            page = context.new_page()
-            logger.info(f"Navigating to login page: {self.base_url}")
-            page.goto(self.base_url)
-            
+    async def _warm_page(self, page, engine):
+        """Loads the IDE on a tab and makes sure it is logged in and the editor is ready."""
+        await page.goto(engine.sql_url)
+        try:
+            await page.wait_for_load_state("networkidle", timeout=30000)
+        except Exception:
+            pass
+
+        if "login" in page.url.lower() or await page.query_selector('input[type="password"]'):
+            logger.info("Session expired. Performing auto-login...")
+            await engine._perform_login_logic(page)
+            await page.goto(engine.sql_url)
             try:
-                page.wait_for_load_state("networkidle", timeout=10000)
-            except:
+                await page.wait_for_load_state("networkidle", timeout=15000)
+            except Exception:
+                pass
+            await self._save_cookies()
+
+        await page.wait_for_selector(EDITOR_SELECTOR, timeout=20000)
+
+    async def _acquire(self, engine):
+        url = engine.sql_url
+        if url not in self._pools:
+            self._pools[url] = asyncio.Queue()
+            self._opened[url] = 0
+
+        pool = self._pools[url]
+        while True:
+            if pool.empty() and self._opened[url] < self.pool_size:
+                self._opened[url] += 1
+                page = await self.context.new_page()
+                try:
+                    logger.info(f"Warming IDE tab #{self._opened[url]}: {url}")
+                    await self._warm_page(page, engine)
+                except BaseException:
+                    # Also on cancellation (acquire timeout), so the slot is not leaked
+                    self._opened[url] -= 1
+                    await page.close()
+                    raise
+                return page
+            page = await pool.get()
+            if page is not _TAB_DROPPED:
+                return page
+
+    async def _release(self, page, engine):
+        """Resets the tab to a clean IDE state before returning it to the pool."""
+        pool = self._pools[engine.sql_url]
+        try:
+            await self._warm_page(page, engine)
+            pool.put_nowait(page)
+        except Exception as e:
+            logger.warning(f"Dropping broken IDE tab: {e}")
+            self._opened[engine.sql_url] -= 1
+            pool.put_nowait(_TAB_DROPPED)
+            try:
+                await page.close()
+            except Exception:
+                pass
+
+    def _release_done(self, task):
+        self._releases.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Resetting IDE tab failed: {task.exception()}")
+
+    async def _run(self, engine, sql_text):
+        try:
+            page = await asyncio.wait_for(self._acquire(engine), settings.TA_TAB_WAIT_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"No IDE tab became free within {settings.TA_TAB_WAIT_TIMEOUT}s")
+        try:
+            return await engine._run_on_page(page, sql_text)
+        finally:
+            # Reload in the background so the caller does not wait for it
+            task = asyncio.ensure_future(self._release(page, engine))
+            self._releases.add(task)
+            task.add_done_callback(self._release_done)
+
+    async def _login(self, engine):
+        page = await self.context.new_page()
+        try:
+            logger.info(f"Navigating to login page: {engine.base_url}")
+            await page.goto(engine.base_url)
+            try:
+                await page.wait_for_load_state("networkidle", timeout=10000)
+            except Exception:
                 pass
 
             is_login_page = "login" in page.url.lower() or \
-                           page.query_selector('input[type="password"]') or \
-                           page.query_selector('input[placeholder*="Password"]')
+                            await page.query_selector('input[type="password"]') or \
+                            await page.query_selector('input[placeholder*="Password"]')
 
             if is_login_page:
                 logger.info("Login page detected, performing auto-login...")
                 try:
-                    self._perform_login_logic(page)
+                    await engine._perform_login_logic(page)
                     logger.info("Auto-login successful!")
                 except Exception as e:
                     logger.error(f"Auto-login failed: {e}")
-                    page.screenshot(path="output/login_failed.png")
+                    await page.screenshot(path=os.path.join(settings.OUTPUT_DIR, "login_failed.png"))
             else:
                 logger.info("Active session detected, skipping login.")
-            
-            time.sleep(2)
-            context.close()
+            await page.wait_for_timeout(2000)
+            await self._save_cookies()
+        finally:
+            await page.close()
+
+    async def _save_cookies(self):
+        """Exports the context cookies so the HTTP engine can reuse the login."""
+        try:
+            await self.context.storage_state(path=settings.TA_COOKIE_FILE)
+        except Exception as e:
+            logger.warning(f"Could not save TA cookies: {e}")
+
+    def run(self, engine, sql_text):
+        return self._call(self._run(engine, sql_text), timeout=settings.TA_TAB_WAIT_TIMEOUT + settings.TA_QUERY_TIMEOUT)
+
+    def login(self, engine):
+        self._call(self._login(engine), timeout=settings.TA_QUERY_TIMEOUT)
+
+    async def _close(self):
+        await self.context.close()
+        await self._playwright.stop()
+
+    def close(self):
+        try:
+            self._call(self._close())
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def get_session(user_data_dir, headless=True, temporary=False):
+    """
+    Returns the process-wide session for a browser profile, starting it on first use.
+    A persistent profile can only be opened once, so later callers share the first
+    session even if they asked for a different headless mode.
+    temporary marks a session started only for a short job (HTTP mode cookie refresh);
+    release_session closes it unless a regular caller has used it in the meantime.
+    """
+    with _sessions_lock:
+        session = _sessions.get(user_data_dir)
+        if session is None:
+            session = TASession(user_data_dir, headless=headless, pool_size=settings.TA_TAB_POOL_SIZE)
+            session.temporary = temporary
+            _sessions[user_data_dir] = session
+        else:
+            if session.headless != headless:
+                logger.info(f"Reusing running TA session (headless={session.headless}).")
+            if not temporary:
+                session.temporary = False
+        return session
+
+def close_session(user_data_dir):
+    with _sessions_lock:
+        session = _sessions.pop(user_data_dir, None)
+    if session:
+        session.close()
+
+def release_session(user_data_dir):
+    """Closes the session only if it is still temporary, i.e. no browser-mode task shares it."""
+    with _sessions_lock:
+        session = _sessions.get(user_data_dir)
+        if session is None or not session.temporary:
+            return
+        del _sessions[user_data_dir]
+    session.close()
+
+def download_path_for(filename):
+    """
+    Unique OUTPUT_DIR path for a downloaded result. Queries run concurrently and
+    often get the same suggested filename, so each download gets its own prefix.
+    """
+    return os.path.join(settings.OUTPUT_DIR, f"{uuid.uuid4().hex[:8]}_{filename}")
+
+@atexit.register
+def close_sessions():
+    with _sessions_lock:
+        for session in _sessions.values():
+            try:
+                session.close()
+            except Exception:
+                pass
+        _sessions.clear()
+
+class ThinkingDataEngine(BaseEngine):
+    """
+    Engine for ThinkingData platform using Playwright automation.
+    Queries run on pooled IDE tabs of a shared TASession.
+    """
+    def __init__(self, config):
+        self.config = config
+        self.base_url = config.url
+        self.sql_url = config.sql_url
+        self.username = config.user
+        self.password = config.password
+        self.user_data_dir = settings.TA_SESSION_DIR
+
+    def login(self, headless=False):
+        if not self.username or not self.password:
+            logger.error("TA credentials missing.")
+            return
+        get_session(self.user_data_dir, headless=headless).login(self)
 
     def fetch(self, sql: str, **kwargs) -> list:
         return self.run_sql_query(sql_text=sql, headless=kwargs.get('headless', True))
 
     def run_sql_query(self, sql_text=None, headless=True):
+        try:
+            return get_session(self.user_data_dir, headless=headless).run(self, sql_text)
+        except Exception as e:
+            logger.error(f"Execution failed: {e}")
+            return []
+
+    async def _run_on_page(self, page, sql_text):
         results_data = []
+        data_ready = asyncio.Event()
+        status_failed = asyncio.Event()
+        start_time = time.time()
+        state = {"name": "submitting", "engine_status": None, "error": None}
+
+        def transition(new_state, detail=""):
+            if state["name"] != new_state:
+                elapsed = time.time() - start_time
+                logger.info(f"[+{elapsed:.3f}s] State: {state['name']} -> {new_state}" + (f" ({detail})" if detail else ""))
+                state["name"] = new_state
+
+        async def handle_response(response):
+            try:
+                if response.status == 200 and "json" in response.headers.get("content-type", "").lower():
+                    data = await response.json()
+                    payload = data.get("data", data) if isinstance(data, dict) else data
+                    if isinstance(payload, dict):
+                        # Query-status polling done by the IDE itself
+                        engine_status = payload.get("status") or payload.get("state")
+                        if isinstance(engine_status, str) and engine_status != state["engine_status"]:
+                            state["engine_status"] = engine_status
+                            logger.info(f"[+{time.time() - start_time:.3f}s] Engine status: {engine_status}")
+                            if engine_status.lower() in TA_FAILED_STATUSES:
+                                state["error"] = payload.get("message") or payload.get("msg") or engine_status
+                                status_failed.set()
+
+                        for key in ["rows", "result", "results", "list"]:
+                            if key in payload and isinstance(payload[key], list) and len(payload[key]) > 0:
+                                if any(k in payload for k in ["header", "columns", "headers"]):
+                                    results_data.append(payload)
+                                    logger.info(f"Intercepted data via key [{key}]: {len(payload[key])} rows.")
+                                    data_ready.set()
+                                    return
+            except:
+                pass
+
+        page.on("response", handle_response)
+
+        try:
+            if sql_text:
+                logger.info("Injecting SQL into editor...")
+                editor = await page.wait_for_selector(EDITOR_SELECTOR, timeout=20000)
+                await editor.click()
 
-        with sync_playwright() as p:
-            context = p.chromium.launch_persistent_context(
-                self.user_data_dir,
-                headless=headless,
-                slow_mo=100,
-                permissions=["clipboard-read", "clipboard-write"]
-            )
-            page = context.new_page()
+                await page.keyboard.press("Control+A")
+                await page.keyboard.press("Backspace")
 
-            def handle_response(response):
+                # Direct Monaco injection
                 try:
-                    if response.status == 200 and "json" in response.headers.get("content-type", "").lower():
-                        data = response.json()
-                        payload = data.get("data", data) if isinstance(data, dict) else data
-                        if isinstance(payload, dict):
-                            for key in ["rows", "result", "results", "list"]:
-                                if key in payload and isinstance(payload[key], list) and len(payload[key]) > 0:
-                                    if any(k in payload for k in ["header", "columns", "headers"]):
-                                        results_data.append(payload)
-                                        logger.info(f"Intercepted data via key [{key}]: {len(payload[key])} rows.")
-                                        return
+                    success = await page.evaluate("""(text) => {
+                        if (window.monaco && monaco.editor.getModels().length > 0) {
+                            monaco.editor.getModels()[0].setValue(text);
+                            return true;
+                        }
+                        const models = window.monaco?.editor?.getModels();
+                        if (models && models.length > 0) {
+                            models[0].setValue(text);
+                            return true;
+                        }
+                        return false;
+                    }""", sql_text)
                 except:
-                    pass
+                    success = False
 
-            page.on("response", handle_response)
-            
-            logger.info(f"Opening IDE page: {self.sql_url}")
-            page.goto(self.sql_url)
-            
-            try:
-                page.wait_for_load_state("networkidle", timeout=30000)
-                
-                if "login" in page.url.lower() or page.query_selector('input[type="password"]'):
-                    logger.info("Session expired. Performing auto-login...")
-                    self._perform_login_logic(page)
-                    page.goto(self.sql_url)
-                    page.wait_for_load_state("networkidle", timeout=15000)
-
-                if sql_text:
-                    logger.info("Injecting SQL into editor...")
-                    editor_selector = ".monaco-editor, .CodeMirror, .ace_editor, textarea"
-                    editor = page.wait_for_selector(editor_selector, timeout=20000)
-                    editor.click()
-                    
-                    page.keyboard.press("Control+A")
-                    page.keyboard.press("Backspace")
-                    page.wait_for_timeout(500)
-                    
-                    # Direct Monaco injection
+                if not success:
+                    await editor.click()
+                    await page.keyboard.press("Control+A")
+                    await page.keyboard.press("Backspace")
+                    await page.keyboard.insert_text(sql_text)
+
+                await page.wait_for_timeout(500)
+
+                # Trigger Calculate
+                calc_btn = await page.query_selector(TA_CALC_SELECTOR)
+                if calc_btn:
+                    logger.info("Triggering 'Calculate' button...")
+                    await calc_btn.click()
+                else:
+                    logger.info("Triggering Ctrl+Enter...")
+                    await page.keyboard.press("Control+Enter")
+            transition("submitted")
+
+            # Feedback mechanism: race the completion signals instead of polling the DOM
+            logger.info("Waiting for data (listening for engine events)...")
+            max_timeout = 3600
+            outcome = await self._wait_for_outcome(page, data_ready, status_failed, transition, max_timeout * 1000)
+
+            if outcome == "download":
+                transition("download_ready")
+                download_btn = await page.query_selector(TA_DOWNLOAD_SELECTOR)
+                btn_text = await download_btn.inner_text() if download_btn else ""
+                if download_btn and "下载" not in btn_text and "Download" not in btn_text:
+                    # Icon-only button opens a menu holding the real "全量下载" entry
+                    await download_btn.click()
+                    real_btn = page.locator('li:has-text("全量下载"), span:has-text("全量下载"), button:has-text("全量下载")').first
                     try:
-                        success = page.evaluate("""(text) => {
-                            if (window.monaco && monaco.editor.getModels().length > 0) {
-                                monaco.editor.getModels()[0].setValue(text);
-                                return true;
-                            }
-                            const models = window.monaco?.editor?.getModels();
-                            if (models && models.length > 0) {
-                                models[0].setValue(text);
-                                return true;
-                            }
-                            return false;
-                        }""", sql_text)
-                    except:
-                        success = False
-
-                    if not success:
-                        editor.click()
-                        page.keyboard.press("Control+A")
-                        page.keyboard.press("Backspace")
-                        page.keyboard.insert_text(sql_text)
-                    
-                    page.wait_for_timeout(2000)
-
-                    # Trigger Calculate
-                    calc_btn = page.query_selector('button:has-text("Calculate"), button:has-text("计算"), .ant-btn:has-text("计算")')
-                    if calc_btn:
-                        logger.info("Triggering 'Calculate' button...")
-                        calc_btn.click()
-                    else:
-                        logger.info("Triggering Ctrl+Enter...")
-                        page.keyboard.press("Control+Enter")
-
-                # Feedback mechanism
-                logger.info("Waiting for data (checking engine status)...")
-                max_timeout = 3600 
-                start_time = time.time()
-                
-                while not results_data and (time.time() - start_time < max_timeout):
-                    # 1. Aggressive Download detection
-                    download_selectors = ['button:has-text("Download All")', 'button:has-text("全量下载")', '.ant-btn:has-text("全量下载")', 'span:has-text("全量下载")', '.anticon-download', '.anticon-export', '.ide-download-btn']
-                    download_btn = None
-                    for sel in download_selectors:
-                        download_btn = page.query_selector(sel)
-                        if download_btn and download_btn.is_visible(): break
-                    
-                    if download_btn:
-                        if "下载" not in download_btn.inner_text() and "Download" not in download_btn.inner_text():
-                            download_btn.click()
-                            page.wait_for_timeout(2000)
-                            real_btn = page.query_selector('li:has-text("全量下载"), span:has-text("全量下载"), button:has-text("全量下载")')
-                            if real_btn: download_btn = real_btn
-
-                        if download_btn:
-                            logger.info("Success! Starting download...")
-                            with page.expect_download(timeout=120000) as download_info:
-                                download_btn.click()
-                            download = download_info.value
-                            download_path = os.path.join(settings.OUTPUT_DIR, download.suggested_filename)
-                            download.save_as(download_path)
-                            results_data.append({"file_path": download_path, "type": "file"})
-                            break
-
-                    # 2. Progress Feedback
-                    status_area = page.query_selector('.ant-tabs-tabpane-active, .ide-results-area')
-                    status_text = status_area.inner_text() if status_area else ""
-                    
-                    is_running = any(x in status_text for x in ["查询引擎运行中", "已进行", "查询结果处理中", "处理中", "Executing"]) or \
-                                 page.query_selector('.ant-spin-spinning, .ant-progress-circle, .ant-spin')
-                    
-                    if is_running:
-                        elapsed = int(time.time() - start_time)
-                        if elapsed % 15 == 0:
-                            logger.info(f"Feedback: Progressing... [{status_text.strip() if status_text else 'Calculating'}]")
-                        page.wait_for_timeout(3000)
-                        continue
-
-                    # 3. Error detection
-                    error_indicators = ["java.sql.SQLException", "Parse exception", "Error", "mismatched input", "cannot be resolved"]
-                    if any(ind in status_text for ind in error_indicators):
-                        logger.error(f"SQL failed: {status_text.strip()}")
-                        break
-
-                    # 4. Success but UI Lag
-                    if "100%" in status_text or "处理中" in status_text:
-                        page.wait_for_timeout(2000)
-                        continue
-
-                    page.wait_for_timeout(3000)
-                    
-                    # 5. Idle check
-                    calc_ready = page.query_selector('button:has-text("Calculate"), button:has-text("计算")')
-                    if calc_ready and calc_ready.is_enabled() and not results_data:
-                        result_area = page.query_selector('.ant-tabs-tabpane-active, .ide-results-area, .ant-table-body')
-                        if result_area and ("100%" in status_text or "条结果" in status_text or "Rows" in status_text):
-                             page.wait_for_timeout(5000)
-                             continue
-                        else:
-                            logger.info("IDE idle. No data captured.")
-                            break
-
-            except Exception as e:
-                logger.error(f"Execution failed: {e}")
-            
-            context.close()
+                        await real_btn.wait_for(state="visible", timeout=5000)
+                        download_btn = real_btn
+                    except Exception:
+                        pass
+
+                if download_btn:
+                    logger.info("Success! Starting download...")
+                    async with page.expect_download(timeout=120000) as download_info:
+                        await download_btn.click()
+                    download = await download_info.value
+                    download_path = download_path_for(download.suggested_filename)
+                    await download.save_as(download_path)
+                    results_data.append({"file_path": download_path, "type": "file"})
+                    transition("downloaded")
+            elif outcome == "data":
+                transition("data_captured")
+            elif outcome == "error":
+                transition("failed")
+                if state["error"] is None:
+                    status_area = await page.query_selector(TA_STATUS_SELECTOR)
+                    state["error"] = (await status_area.inner_text()).strip() if status_area else "unknown error"
+                logger.error(f"SQL failed: {state['error']}")
+            elif outcome == "idle":
+                transition("idle")
+                logger.info("IDE idle. No data captured.")
+            else:
+                transition("timeout")
+                logger.error(f"No result within {max_timeout}s.")
+
+        except Exception as e:
+            logger.error(f"Execution failed: {e}")
+        finally:
+            page.remove_listener("response", handle_response)
+
         return results_data
 
-    def _perform_login_logic(self, page):
-        user_input = page.wait_for_selector('input[placeholder*="Account"], input[placeholder*="Username"], input[placeholder*="账号"], input[id="username"], input[type="text"]', timeout=15000)
-        pass_input = page.wait_for_selector('input[placeholder*="Password"], input[placeholder*="密码"], input[id="password"], input[type="password"]', timeout=15000)
-        
-        user_input.fill("")
-        user_input.type(self.username, delay=30)
-        pass_input.fill("")
-        pass_input.type(self.password, delay=30)
-        
-        page.wait_for_timeout(1000)
-        
+    async def _wait_for_outcome(self, page, data_ready, status_failed, transition, timeout_ms):
+        """
+        Waits for the first of: intercepted rows, a visible download button,
+        an error in the status area / engine status, or the IDE going idle.
+        Returns the name of the winning signal, or "timeout".
+        """
+        async def wait_download():
+            await page.locator(TA_DOWNLOAD_SELECTOR).first.wait_for(state="attached", timeout=timeout_ms)
+
+        async def wait_dom_error():
+            await page.locator(TA_STATUS_SELECTOR).filter(has_text=TA_ERROR_PATTERN).first.wait_for(state="visible", timeout=timeout_ms)
+
+        async def wait_idle():
+            # Idle = the engine spinner came and went without producing anything else, and
+            # Calculate is clickable again (it stays disabled while the query is queued or running)
+            try:
+                await page.locator(TA_SPINNER_SELECTOR).first.wait_for(state="attached", timeout=30000)
+                transition("running")
+            except Exception:
+                pass
+            while True:
+                await page.locator(TA_SPINNER_SELECTOR).first.wait_for(state="detached", timeout=timeout_ms)
+                transition("engine_done")
+                await asyncio.sleep(TA_IDLE_GRACE)
+                # Result post-processing can outlive the spinner
+                status_area = await page.query_selector(TA_STATUS_SELECTOR)
+                status_text = await status_area.inner_text() if status_area else ""
+                if any(x in status_text for x in TA_RUNNING_MARKERS):
+                    transition("processing", status_text.strip()[:80])
+                    continue
+                calc_btn = await page.query_selector(TA_CALC_SELECTOR)
+                if calc_btn and await calc_btn.is_enabled():
+                    return
+
+        waiters = {
+            asyncio.ensure_future(data_ready.wait()): "data",
+            asyncio.ensure_future(wait_download()): "download",
+            asyncio.ensure_future(status_failed.wait()): "error",
+            asyncio.ensure_future(wait_dom_error()): "error",
+            asyncio.ensure_future(wait_idle()): "idle",
+        }
+        pending = set(waiters)
+        outcome = "timeout"
+        deadline = time.time() + timeout_ms / 1000
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=max(0, deadline - time.time()), return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break
+                # A waiter that raised (e.g. selector timeout) just drops out of the race
+                winners = [t for t in done if not t.cancelled() and t.exception() is None]
+                if winners:
+                    outcome = min((waiters[t] for t in winners), key=TA_OUTCOME_PRIORITY.index)
+                    break
+        finally:
+            for t in pending:
+                t.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        return outcome
+
+    async def _perform_login_logic(self, page):
+        user_input = await page.wait_for_selector('input[placeholder*="Account"], input[placeholder*="Username"], input[placeholder*="账号"], input[id="username"], input[type="text"]', timeout=15000)
+        pass_input = await page.wait_for_selector('input[placeholder*="Password"], input[placeholder*="密码"], input[id="password"], input[type="password"]', timeout=15000)
+
+        await user_input.fill("")
+        await user_input.type(self.username, delay=30)
+        await pass_input.fill("")
+        await pass_input.type(self.password, delay=30)
+
+        await page.wait_for_timeout(1000)
+
         button_clicked = False
         login_btn = page.get_by_role("button", name="登录").or_(page.get_by_text("登录", exact=True)).first
-        if login_btn.is_visible():
-            login_btn.click()
+        if await login_btn.is_visible():
+            await login_btn.click()
             button_clicked = True
 
         if not button_clicked:
             login_btn_selectors = ['button:has-text("登录")', '.ant-btn-primary', 'button[type="submit"]']
             for selector in login_btn_selectors:
-                candidate = page.query_selector(selector)
-                if candidate and candidate.is_visible():
-                    candidate.click()
+                candidate = await page.query_selector(selector)
+                if candidate and await candidate.is_visible():
+                    await candidate.click()
                     button_clicked = True
                     break
 
-        page.wait_for_timeout(1000)
-        pass_input.focus()
-        page.keyboard.press("Enter")
-        page.wait_for_timeout(5000)
+        await page.wait_for_timeout(1000)
+        await pass_input.focus()
+        await page.keyboard.press("Enter")
+        await page.wait_for_timeout(5000)
@@ -0,0 +1,174 @@
+import os
+import re
+import json
+import time
+import shutil
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from src.core.engines.ta_engine import ThinkingDataEngine, get_session, release_session, download_path_for
+from src.utils.logger import logger
+from src.config import settings
+
+# One browser login at a time: concurrent tasks share the browser session, and the
+# first to finish would otherwise close it under the others
+_refresh_lock = threading.Lock()
+# Login attempts per query; a second one covers cookies refreshed for another region
+MAX_LOGINS = 2
+
+class TASessionExpired(Exception):
+    """Raised when the IDE endpoints reject the saved cookies."""
+
+class ThinkingDataHttpEngine(ThinkingDataEngine):
+    """
+    ThinkingData engine that talks to the IDE query endpoints over plain HTTP,
+    reusing the cookies exported by the browser session. The browser is only
+    started when those cookies are missing or expired.
+    """
+    STATUS_DONE = {"finished", "finish", "success", "succeeded", "done", "completed"}
+    STATUS_FAILED = {"failed", "fail", "error", "cancelled", "canceled", "killed"}
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.api_base = self.base_url if self.base_url.endswith("/") else self.base_url + "/"
+        self.cookie_file = settings.TA_COOKIE_FILE
+
+    def run_sql_query(self, sql_text=None, headless=True):
+        if not sql_text:
+            return []
+        try:
+            for attempt in range(MAX_LOGINS + 1):
+                stamp = self._cookie_stamp()
+                try:
+                    return self._run_http(sql_text)
+                except TASessionExpired:
+                    if attempt == MAX_LOGINS:
+                        raise
+                    logger.info("TA cookies missing or expired, logging in through the browser...")
+                    self._refresh_cookies(stamp, headless)
+        except Exception as e:
+            logger.error(f"Execution failed: {e}")
+            return []
+
+    def _cookie_stamp(self):
+        try:
+            st = os.stat(self.cookie_file)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _refresh_cookies(self, stale_stamp, headless=True):
+        """
+        Logs in through the browser and saves fresh cookies. stale_stamp identifies the
+        cookie file that was rejected (None: there was none); if it has changed by the
+        time the lock is held, another task has already logged in and its cookies are
+        used instead.
+        """
+        with _refresh_lock:
+            if self._cookie_stamp() != stale_stamp:
+                logger.info("TA cookies were refreshed by another task, reusing them.")
+                return
+            get_session(self.user_data_dir, headless=headless, temporary=True).login(self)
+            # The browser is no longer needed once the cookies are on disk, unless
+            # browser-mode tasks of the same batch are running on it
+            release_session(self.user_data_dir)
+
+    def _cookie_header(self):
+        if not os.path.exists(self.cookie_file):
+            raise TASessionExpired("No saved TA cookies.")
+        with open(self.cookie_file, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+
+        host = urllib.parse.urlparse(self.api_base).hostname or ""
+        pairs = []
+        for c in state.get("cookies", []):
+            domain = c.get("domain", "").lstrip(".")
+            if host == domain or host.endswith("." + domain):
+                pairs.append(f"{c['name']}={c['value']}")
+        if not pairs:
+            raise TASessionExpired(f"No saved TA cookies for {host}.")
+        return "; ".join(pairs)
+
+    def _request(self, path, params=None, body=None):
+        url = urllib.parse.urljoin(self.api_base, path)
+        if params:
+            url += ("&" if "?" in url else "?") + urllib.parse.urlencode(params)
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        req = urllib.request.Request(url, data=data, method="POST" if data is not None else "GET")
+        req.add_header("Cookie", self._cookie_header())
+        req.add_header("Accept", "application/json, text/csv, */*")
+        if data is not None:
+            req.add_header("Content-Type", "application/json;charset=UTF-8")
+
+        try:
+            resp = urllib.request.urlopen(req, timeout=60)
+        except urllib.error.HTTPError as e:
+            if e.code in (401, 403):
+                raise TASessionExpired(f"HTTP {e.code} from {path}")
+            raise
+        if "login" in resp.geturl().lower():
+            resp.close()
+            raise TASessionExpired(f"Redirected to login from {path}")
+        return resp
+
+    def _request_json(self, path, params=None, body=None):
+        with self._request(path, params=params, body=body) as resp:
+            if "json" not in resp.headers.get("Content-Type", "").lower():
+                raise TASessionExpired(f"Non-JSON response from {path} (login page?)")
+            payload = json.loads(resp.read().decode("utf-8"))
+        if isinstance(payload, dict) and str(payload.get("code", "")) in ("401", "403"):
+            raise TASessionExpired(payload.get("msg") or payload.get("message") or "Not logged in")
+        return payload.get("data", payload) if isinstance(payload, dict) else payload
+
+    @staticmethod
+    def _pick(payload, *keys):
+        if isinstance(payload, dict):
+            for k in keys:
+                if payload.get(k) not in (None, ""):
+                    return payload[k]
+        return None
+
+    def _run_http(self, sql_text):
+        logger.info("Submitting SQL via TA HTTP API...")
+        submitted = self._request_json(self.config.api_submit_path, body={"sql": sql_text})
+        task_id = self._pick(submitted, "taskId", "task_id", "queryId", "id")
+        if task_id is None:
+            raise RuntimeError(f"Submit response has no task id: {submitted}")
+        logger.info(f"Query submitted, task id: {task_id}")
+
+        max_timeout = 3600
+        start_time = time.time()
+        interval = 0.5
+        last_status = None
+        while time.time() - start_time < max_timeout:
+            state = self._request_json(self.config.api_status_path, params={"taskId": task_id})
+            status = str(self._pick(state, "status", "state") or "").lower()
+            if status != last_status:
+                logger.info(f"Query status: {status or 'unknown'} (+{time.time() - start_time:.1f}s)")
+                last_status = status
+            if status in self.STATUS_DONE:
+                break
+            if status in self.STATUS_FAILED:
+                raise RuntimeError(f"SQL failed: {self._pick(state, 'message', 'msg', 'error') or status}")
+            time.sleep(interval)
+            interval = min(interval * 1.5, 5)
+        else:
+            raise TimeoutError(f"Query {task_id} did not finish within {max_timeout}s")
+
+        return [self._download(task_id)]
+
+    def _download(self, task_id):
+        with self._request(self.config.api_download_path, params={"taskId": task_id}) as resp:
+            filename = f"ta_{task_id}.csv"
+            disposition = resp.headers.get("Content-Disposition", "")
+            match = re.search(r'filename\*?=(?:UTF-8\'\')?"?([^";]+)"?', disposition)
+            if match:
+                filename = os.path.basename(urllib.parse.unquote(match.group(1)))
+
+            download_path = download_path_for(filename)
+            with open(download_path, 'wb') as f:
+                shutil.copyfileobj(resp, f, length=1024 * 1024)
+
+        logger.info(f"Downloaded result to: {download_path}")
+        return {"file_path": download_path, "type": "file"}
@@ -0,0 +1,99 @@
+import time
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from src.config import settings
+from src.utils.logger import logger, task_context
+
+class BatchExecutor:
+    """
+    Runs fetch tasks on a worker pool while honouring per-engine
+    and per-region concurrency limits. A task is only handed to the pool once
+    its engine and region have a free slot, so tasks waiting on a saturated
+    engine never occupy a worker that a task of another engine could use.
+    """
+    def __init__(self, runner, max_workers=None, engine_limits=None, region_limits=None):
+        self.runner = runner
+        self.max_workers = max_workers or settings.BATCH_WORKERS
+        self.engine_limits = engine_limits or settings.ENGINE_CONCURRENCY
+        self.region_limits = region_limits or settings.REGION_CONCURRENCY
+        self._cond = threading.Condition()
+        self._running = {}
+
+    def _slots(self, task):
+        return [("engine", task.get("engine", "ta"), self.engine_limits), ("region", task.get("region", "global"), self.region_limits)]
+
+    def _has_slot(self, task):
+        return all(self._running.get((kind, key), 0) < max(1, int(limits.get(key, self.max_workers)))
+                   for kind, key, limits in self._slots(task))
+
+    def _take_slots(self, task, delta):
+        for kind, key, _ in self._slots(task):
+            self._running[(kind, key)] = self._running.get((kind, key), 0) + delta
+
+    def _run_one(self, task):
+        engine_name = task.get("engine", "ta")
+        region = task.get("region", "global")
+        task_name = task.get("name", f"{engine_name}_export")
+        summary = {"name": task_name, "engine": engine_name, "region": region, "status": "pending", "duration": 0.0}
+
+        token = task_context.set(task_name)
+        start_time = time.time()
+        try:
+            # The runner returns the exported files; nothing fetched or exported is a failure
+            file_paths = self.runner(task)
+            summary["status"] = "success" if file_paths else "failed"
+        except Exception as e:
+            logger.error(f"Task crashed: {e}")
+            summary["status"] = "error"
+        finally:
+            summary["duration"] = time.time() - start_time
+            task_context.reset(token)
+        return summary
+
+    def _finish(self, summaries, idx, task, future):
+        """Done callback: records the summary and frees the task's engine/region slots."""
+        with self._cond:
+            try:
+                summaries[idx] = future.result()
+            except Exception as e:
+                logger.error(f"Task crashed: {e}")
+                summaries[idx] = {
+                    "name": task.get("name", "Unknown"), "engine": task.get("engine", "ta"),
+                    "region": task.get("region", "global"), "status": "error", "duration": 0.0
+                }
+            finally:
+                self._take_slots(task, -1)
+                self._cond.notify_all()
+
+    def run(self, tasks):
+        """
+        Executes the given task configs and returns one summary dict per task,
+        in the same order as the input.
+        """
+        summaries = [None] * len(tasks)
+        pending = []
+        for idx, t in enumerate(tasks):
+            if t.get("paused", False):
+                logger.info(f"⏭  Skipping paused task: {t.get('name', 'Unknown')}")
+                summaries[idx] = {
+                    "name": t.get("name", "Unknown"), "engine": t.get("engine", "ta"),
+                    "region": t.get("region", "global"), "status": "skipped", "duration": 0.0
+                }
+                continue
+            pending.append(idx)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="fetch") as pool:
+            with self._cond:
+                # Dispatch in input order, letting tasks of a free engine pass blocked ones
+                while pending:
+                    active = sum(n for (kind, _), n in self._running.items() if kind == "engine")
+                    idx = next((i for i in pending if self._has_slot(tasks[i])), None) if active < self.max_workers else None
+                    if idx is None:
+                        self._cond.wait()
+                        continue
+                    pending.remove(idx)
+                    self._take_slots(tasks[idx], 1)
+                    future = pool.submit(self._run_one, tasks[idx])
+                    future.add_done_callback(partial(self._finish, summaries, idx, tasks[idx]))
+        return summaries
@@ -1,40 +1,249 @@
 import pandas as pd
 import numpy as np
 from scipy.optimize import curve_fit
-from datetime import datetime
+import os
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
 from src.utils.logger import logger
 
+FIT_METHODS = ("refine", "loglog")
+# Percentiles reported by the bootstrap bands
+BAND_QUANTILES = (10, 50, 90)
+# Days of actual ARPU averaged by the projection
+ARPU_WINDOW = 7
+# Bumped whenever the layout of LTVService.state changes; older states are recomputed
+STATE_VERSION = 1
+# State file key of a single-cohort prediction
+SINGLE_COHORT_STATE = "cohort"
+
 def power_function(num_day, a, b):
     """Model for LTV/Retention fitting: y = a * x^b"""
     return a * num_day**b
 
+def project_arpu(actual_arpu, window: int = ARPU_WINDOW, resume=None):
+    """
+    ARPU projection: each day is predicted as the mean of the valid actual ARPU of the
+    previous `window` days, corrected by the cumulative prediction error so far.
+    actual_arpu is one curve (1-D) or one curve per row (2-D, NaN-padded on the right).
+    Returns (predicted_arpu, cumulative_error, cumulative_actual_arpu, cumulative_pred_arpu).
+
+    The window means are computed for all days at once. Only the error recurrence is
+    sequential: a float loop for one curve, or one vectorized step per day across all
+    curves. Window sums add the days oldest first and the cumulative sums run left to
+    right, the same operations in the same order as a per-day np.mean, so results are
+    bitwise identical to the original day-by-day loop.
+
+    resume continues a single curve after the days of an earlier projection instead of
+    starting at day 1. It holds the last `window` actual ARPU values ("history") and the
+    final "cumulative_actual_arpu", "cumulative_pred_arpu" and "cumulative_error" of that
+    projection; the result equals the tail of a projection over the whole history.
+    """
+    actual = np.asarray(actual_arpu, dtype=float)
+    single = actual.ndim == 1
+    actual = np.atleast_2d(actual)
+    if resume is not None and not single:
+        raise ValueError("resume is only supported for a single curve")
+
+    # Days before the first one projected here only feed the window means
+    history = np.asarray(resume["history"], dtype=float)[-window:] if resume is not None else np.empty(0)
+    lead = len(history)
+    full = np.concatenate([np.broadcast_to(history, (actual.shape[0], lead)), actual], axis=1)
+    num_rows = actual.shape[1]
+
+    valid = ~np.isnan(full)
+    values = np.where(valid, full, 0.0)
+    window_sum = np.zeros_like(values)
+    window_count = np.zeros(full.shape, dtype=np.int64)
+    for k in range(min(window, full.shape[1]), 0, -1):
+        window_sum[:, k:] += values[:, :-k]
+        window_count[:, k:] += valid[:, :-k]
+    avg_val = np.divide(window_sum, window_count, out=np.zeros_like(window_sum), where=window_count > 0)
+    avg_val, valid, values = avg_val[:, lead:], valid[:, lead:], values[:, lead:]
+
+    start_actual = resume["cumulative_actual_arpu"] if resume is not None else 0.0
+    cumulative_actual_arpu = np.cumsum(np.concatenate([np.full((actual.shape[0], 1), start_actual), values], axis=1), axis=1)[:, 1:]
+    pred_arpu = np.zeros_like(values)
+    cumulative_pred_arpu = np.zeros_like(values)
+    cumulative_error = np.zeros_like(values)
+    if resume is not None:
+        first, carried = 0, (resume["cumulative_pred_arpu"], resume["cumulative_error"])
+    elif num_rows:
+        pred_arpu[:, 0] = values[:, 0]
+        cumulative_pred_arpu[:, 0] = values[:, 0]
+        first, carried = 1, (float(values[0, 0]), 0.0)
+    else:
+        first, carried = 1, (0.0, 0.0)
+
+    if single:
+        _arpu_recurrence(avg_val[0], valid[0], cumulative_actual_arpu[0], pred_arpu[0], cumulative_pred_arpu[0], cumulative_error[0], first, *carried)
+    else:
+        for i in range(1, num_rows):
+            pred_arpu[:, i] = np.where(valid[:, i], avg_val[:, i] * (1 - cumulative_error[:, i - 1]), avg_val[:, i])
+            cumulative_pred_arpu[:, i] = cumulative_pred_arpu[:, i - 1] + pred_arpu[:, i]
+            actual_sum = cumulative_actual_arpu[:, i]
+            np.divide(cumulative_pred_arpu[:, i], actual_sum, out=cumulative_error[:, i], where=actual_sum > 0)
+            np.subtract(cumulative_error[:, i], 1, out=cumulative_error[:, i], where=actual_sum > 0)
+
+    arrays = (pred_arpu, cumulative_error, cumulative_actual_arpu, cumulative_pred_arpu)
+    return tuple(a[0] for a in arrays) if single else arrays
+
+def _arpu_recurrence(avg_val, valid, cumulative_actual_arpu, pred_arpu, cumulative_pred_arpu, cumulative_error,
+                     first=1, cum_pred=0.0, error=0.0):
+    """
+    Error-corrected recurrence of a single curve on Python floats, filling the output
+    arrays in place from index `first`, given the cumulative prediction and error before it.
+    """
+    avg_l, valid_l, actual_l = avg_val.tolist(), valid.tolist(), cumulative_actual_arpu.tolist()
+    pred_l = pred_arpu.tolist()
+    cum_pred_l = cumulative_pred_arpu.tolist()
+    error_l = cumulative_error.tolist()
+    for i in range(first, len(avg_l)):
+        pred = avg_l[i] * (1 - error) if valid_l[i] else avg_l[i]
+        cum_pred = cum_pred + pred
+        error = cum_pred / actual_l[i] - 1 if actual_l[i] > 0 else 0.0
+        pred_l[i], cum_pred_l[i], error_l[i] = pred, cum_pred, error
+    pred_arpu[:] = pred_l
+    cumulative_pred_arpu[:] = cum_pred_l
+    cumulative_error[:] = error_l
+
+def retention_points(df):
+    """(x, y) the retention curve is fitted on: days after day 1 with a known rate, x counted from 1."""
+    fit_data = df.dropna(subset=['actual_rr'])
+    fit_data = fit_data[fit_data['num_day'] > 1]
+    return fit_data['num_day'].values - 1, fit_data['actual_rr'].values
+
+def fit_power_law(x, y):
+    """
+    Closed-form fit of y = a * x^b as the least-squares line log y = log a + b log x.
+    x and y are one curve (1-D) or one curve per row (2-D); NaN and non-positive points
+    are ignored, so rows can be NaN-padded. Returns (a, b), NaN where a row has fewer
+    than two usable points.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    single = x.ndim == 1
+    x, y = np.atleast_2d(x), np.atleast_2d(y)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        usable = (x > 0) & (y > 0)
+        log_x = np.log(np.where(usable, x, 1.0))
+        log_y = np.log(np.where(usable, y, 1.0))
+        n = usable.sum(axis=1)
+        sum_x, sum_y = log_x.sum(axis=1), log_y.sum(axis=1)
+        denom = n * (log_x * log_x).sum(axis=1) - sum_x * sum_x
+        b = (n * (log_x * log_y).sum(axis=1) - sum_x * sum_y) / denom
+        a = np.exp((sum_y - b * sum_x) / n)
+
+    invalid = (n < 2) | ~(np.abs(denom) > 1e-12)
+    a[invalid] = np.nan
+    b[invalid] = np.nan
+    return (a[0], b[0]) if single else (a, b)
+
 class LTVService:
     """
     Professional LTV Prediction Service
     Encapsulates retention fitting, ARPU prediction, and ROI analysis.
     """
-    def __init__(self, data: pd.DataFrame):
+    def __init__(self, data: pd.DataFrame, fit_method: str = "refine", bootstrap: int = 0, seed=None):
+        """
+        fit_method: "refine" starts curve_fit from the closed-form log-log fit,
+        "loglog" uses the closed-form fit directly.
+        bootstrap: number of bootstrap replicates for the P10/P50/P90 LTV bands (0 = off).
+        """
+        if fit_method not in FIT_METHODS:
+            raise ValueError(f"Unknown fit method: {fit_method} (expected one of {FIT_METHODS})")
         self.raw_data = data.copy()
+        self.fit_method = fit_method
+        self.bootstrap = bootstrap
+        self.seed = seed
         self.results_df = None
         self.params_retention = None
+        self.fit_metrics = {}
+        # Filled by predict / update; persisted with save_ltv_states
+        self.state = None
 
-    def _fit_retention(self, df):
+    def _fit_retention(self, df, guess=None):
+        """
+        Fits the power-law retention curve. guess is the closed-form (a, b) when the
+        caller already computed it for many cohorts at once. Records fit time,
+        convergence and function evaluations in self.fit_metrics.
+        """
+        start = time.perf_counter()
+        self.fit_metrics = {"method": self.fit_method, "converged": False, "nfev": 0, "fit_seconds": 0.0}
         try:
-            fit_data = df.dropna(subset=['actual_rr'])
-            fit_data = fit_data[fit_data['num_day'] > 1]
-            if len(fit_data) < 2:
-                return None, None
-            x_data = fit_data['num_day'].values - 1
-            y_data = fit_data['actual_rr'].values
-            params, _ = curve_fit(power_function, x_data, y_data, maxfev=2000)
-            return params
+            if self.fit_method == "loglog" and guess is not None:
+                # Already solved for the whole batch; NaN where the cohort had too few points
+                has_guess = bool(np.all(np.isfinite(guess)))
+                self.fit_metrics["converged"] = has_guess
+                return tuple(guess) if has_guess else None
+
+            x_data, y_data = retention_points(df)
+            if len(x_data) < 2:
+                return None
+            if guess is None:
+                guess = fit_power_law(x_data, y_data)
+            has_guess = bool(np.all(np.isfinite(guess)))
+
+            if self.fit_method == "loglog":
+                self.fit_metrics["converged"] = has_guess
+                return tuple(guess) if has_guess else None
+
+            try:
+                params, _, info, _, _ = curve_fit(
+                    power_function, x_data, y_data, p0=guess if has_guess else None, maxfev=2000, full_output=True
+                )
+                self.fit_metrics.update(converged=True, nfev=int(info["nfev"]))
+                return params
+            except RuntimeError as e:
+                # Not converged within maxfev; the closed-form curve beats falling back to raw rates
+                logger.warning(f"Retention refinement did not converge, using the log-log fit: {e}")
+                return tuple(guess) if has_guess else None
         except Exception as e:
             logger.error(f"Retention fitting error: {e}")
             return None
+        finally:
+            self.fit_metrics["fit_seconds"] = time.perf_counter() - start
 
-    def predict(self, ecpnu: float = 50.0, net_rate: float = 0.35) -> pd.DataFrame:
-        df = self.raw_data.copy()
-        retention_params = self._fit_retention(df)
+    def predict(self, ecpnu: float = 50.0, net_rate: float = 0.35, predicted_arpu=None, retention_guess=None) -> pd.DataFrame:
+        """
+        predicted_arpu / retention_guess: ARPU projection and closed-form retention fit
+        already computed by project_arpu / fit_power_law (LTVBatchService does both for
+        all cohorts at once); computed here when omitted.
+        """
+        return self._project(self.raw_data.copy(), ecpnu, net_rate, predicted_arpu, retention_guess)
+
+    def update(self, state, ecpnu: float = 50.0, net_rate: float = 0.35) -> pd.DataFrame:
+        """
+        Incremental predict from the state of an earlier run on the same cohort.
+        Only days after the last day in state are read from the data: the ARPU projection
+        continues from the stored cumulative values and the refine fit starts from the
+        stored parameters. Days already in state are not re-read, so corrections to past
+        days need a full predict. Returns the same frame as a full predict.
+        """
+        if state.get("version") != STATE_VERSION:
+            raise ValueError(f"Unsupported LTV state version: {state.get('version')}")
+        history = pd.DataFrame({col: state[col] for col in ("num_day", "actual_rr", "actual_arpu")})
+        new_days = self.raw_data[self.raw_data['num_day'] > history['num_day'].iloc[-1]].sort_values('num_day')
+        # Cohort key columns and other constants are not stored; take them from the input,
+        # which still holds the cohort's earlier days even when no new day arrived
+        for col in self.raw_data.columns.difference(history.columns):
+            if len(self.raw_data) and self.raw_data[col].nunique(dropna=False) == 1:
+                history[col] = self.raw_data[col].iloc[0]
+        df = pd.concat([history, new_days], ignore_index=True).reindex(columns=self.raw_data.columns)
+
+        predicted_arpu = np.asarray(state["predicted_arpu"], dtype=float)
+        if len(new_days):
+            resume = dict(state["arpu"], history=state["actual_arpu"][-ARPU_WINDOW:])
+            predicted_arpu = np.concatenate([predicted_arpu, project_arpu(new_days['actual_arpu'].values, resume=resume)[0]])
+
+        # The closed form is cheap to redo; only the iterative refinement reuses the old fit
+        guess = state["params"] if self.fit_method == "refine" and state["params"] is not None else None
+        logger.debug(f"LTV update: {len(new_days)} new days after day {history['num_day'].iloc[-1]}")
+        return self._project(df, ecpnu, net_rate, predicted_arpu, guess)
+
+    def _project(self, df, ecpnu, net_rate, predicted_arpu, retention_guess):
+        retention_params = self._fit_retention(df, retention_guess)
         if retention_params is not None:
             a_fit, b_fit = retention_params
             self.params_retention = (a_fit, b_fit)
@@ -42,31 +251,9 @@ class LTVService:
         else:
             df['predicted_rr'] = df['actual_rr'].fillna(0)
 
-        actual_arpu = df['actual_arpu'].values
-        num_rows = len(df)
-        pred_arpu = np.zeros(num_rows)
-        cumulative_error = np.zeros(num_rows)
-        cumulative_actual_arpu = np.zeros(num_rows)
-        cumulative_pred_arpu = np.zeros(num_rows)
-
-        has_actual_arpu = not np.isnan(actual_arpu[0])
-        pred_arpu[0] = actual_arpu[0] if has_actual_arpu else 0
-        cumulative_actual_arpu[0] = pred_arpu[0]
-        cumulative_pred_arpu[0] = pred_arpu[0]
-
-        for i in range(1, num_rows):
-            history_start = max(0, i - 7)
-            history_window = actual_arpu[history_start:i]
-            valid_history = history_window[~np.isnan(history_window)]
-            avg_val = np.mean(valid_history) if len(valid_history) > 0 else 0
-            pred_arpu[i] = avg_val * (1 - cumulative_error[i-1]) if not np.isnan(actual_arpu[i]) else avg_val
-            current_actual = actual_arpu[i] if not np.isnan(actual_arpu[i]) else 0
-            cumulative_actual_arpu[i] = cumulative_actual_arpu[i-1] + current_actual
-            cumulative_pred_arpu[i] = cumulative_pred_arpu[i-1] + pred_arpu[i]
-            if cumulative_actual_arpu[i] > 0:
-                cumulative_error[i] = (cumulative_pred_arpu[i] / cumulative_actual_arpu[i]) - 1
-            else:
-                cumulative_error[i] = 0
+        if predicted_arpu is None:
+            predicted_arpu = project_arpu(df['actual_arpu'].values)[0]
+        pred_arpu = predicted_arpu[:len(df)]
 
         df['predicted_arpu'] = pred_arpu
         df['predicted_ltv'] = np.cumsum(df['predicted_arpu'] * df['predicted_rr'])
@@ -77,9 +264,78 @@ class LTVService:
         else:
             df['required_ltv'] = np.nan
 
+        if self.bootstrap > 0:
+            self._add_bands(df, self.bootstrap, np.random.default_rng(self.seed))
+
         self.results_df = df
+        self.state = self._capture_state(df)
         return df
 
+    def _capture_state(self, df):
+        """
+        What update needs to continue this prediction: the fitted retention parameters,
+        the daily actuals and predicted ARPU, and the final cumulative ARPU/error values.
+        Cumulative sums run left to right like project_arpu, so they match it exactly.
+        """
+        actual_arpu = df['actual_arpu'].values.astype(float)
+        cumulative_actual = float(np.cumsum(np.nan_to_num(actual_arpu))[-1]) if len(df) else 0.0
+        cumulative_pred = float(np.cumsum(df['predicted_arpu'].values)[-1]) if len(df) else 0.0
+        return {
+            "version": STATE_VERSION,
+            "fit_method": self.fit_method,
+            "params": [float(p) for p in self.params_retention] if self.params_retention is not None else None,
+            "num_day": df['num_day'].astype(int).tolist(),
+            "actual_rr": df['actual_rr'].astype(float).tolist(),
+            "actual_arpu": actual_arpu.tolist(),
+            "predicted_arpu": df['predicted_arpu'].astype(float).tolist(),
+            "arpu": {
+                "cumulative_actual_arpu": cumulative_actual,
+                "cumulative_pred_arpu": cumulative_pred,
+                "cumulative_error": cumulative_pred / cumulative_actual - 1 if cumulative_actual > 0 else 0.0,
+            },
+        }
+
+    def _add_bands(self, df, replicates, rng):
+        """
+        Residual bootstrap of the LTV curve, adding predicted_ltv_p10/p50/p90 columns.
+        Every replicate resamples the log-log retention residuals and the ARPU residuals;
+        all replicates are refitted (fit_power_law) and projected (project_arpu) as one
+        (replicates x days) array, so there is no loop per replicate.
+        """
+        days = df['num_day'].values
+        predicted_rr = df['predicted_rr'].values.astype(float)
+        rr_rep = np.broadcast_to(predicted_rr, (replicates, len(days)))
+
+        x, y = retention_points(df)
+        a, b = fit_power_law(x, y) if len(x) > 2 else (np.nan, np.nan)
+        if self.params_retention is not None and np.isfinite(a) and np.isfinite(b):
+            usable = y > 0
+            x, y = x[usable], y[usable]
+            fitted = np.log(a) + b * np.log(x)
+            log_resid = np.log(y) - fitted
+            y_rep = np.exp(fitted + rng.choice(log_resid, size=(replicates, len(x))))
+            a_rep, b_rep = fit_power_law(np.broadcast_to(x, y_rep.shape), y_rep)
+            # Replicates scale the point fit, so refine and loglog fits share the same bands
+            later = days > 1
+            scale = np.ones((replicates, len(days)))
+            scale[:, later] = power_function(days[later] - 1, a_rep[:, None], b_rep[:, None]) / power_function(days[later] - 1, a, b)
+            rr_rep = predicted_rr * np.nan_to_num(scale, nan=1.0)
+
+        actual_arpu = df['actual_arpu'].values.astype(float)
+        predicted_arpu = df['predicted_arpu'].values
+        valid = ~np.isnan(actual_arpu)
+        arpu_resid = (actual_arpu - predicted_arpu)[valid]
+        if len(arpu_resid):
+            actual_rep = np.tile(actual_arpu, (replicates, 1))
+            actual_rep[:, valid] = np.maximum(predicted_arpu[valid] + rng.choice(arpu_resid, size=(replicates, valid.sum())), 0)
+            arpu_rep = project_arpu(actual_rep)[0]
+        else:
+            arpu_rep = np.broadcast_to(predicted_arpu, (replicates, len(days)))
+
+        ltv_rep = np.cumsum(arpu_rep * rr_rep, axis=1)
+        for q, band in zip(BAND_QUANTILES, np.percentile(ltv_rep, BAND_QUANTILES, axis=0)):
+            df[f'predicted_ltv_p{q}'] = band
+
     def get_summary_benchmarks(self) -> pd.DataFrame:
         if self.results_df is None: return pd.DataFrame()
         benchmarks = [1, 3, 7, 14, 30, 60, 90]
@@ -88,3 +344,153 @@ class LTVService:
             closest_idx = (self.results_df['num_day'] - d).abs().idxmin()
             selected_indices.append(closest_idx)
         return self.results_df.loc[selected_indices].copy()
+
+class LTVBatchService:
+    """
+    LTV prediction for many cohorts at once (e.g. channel x country x install week).
+    Takes a long-format table with one row per cohort and day; every cohort is
+    fitted and projected with LTVService, optionally spread over a process pool.
+    """
+    def __init__(self, data: pd.DataFrame, cohort_keys, fit_method: str = "refine", bootstrap: int = 0, seed=None):
+        if fit_method not in FIT_METHODS:
+            raise ValueError(f"Unknown fit method: {fit_method} (expected one of {FIT_METHODS})")
+        self.raw_data = data.copy()
+        self.cohort_keys = list(cohort_keys)
+        self.fit_method = fit_method
+        # Passed to every cohort's LTVService
+        self.service_options = {"fit_method": fit_method, "bootstrap": bootstrap, "seed": seed}
+        self.results_df = None
+        self.benchmarks_df = None
+        self.failed = []
+        self.fit_metrics = {}
+        # Per-cohort LTVService.state, keyed by state_key(cohort key)
+        self.states = {}
+
+    def predict(self, ecpnu: float = 50.0, net_rate: float = 0.35, workers: int = 1, states=None) -> pd.DataFrame:
+        """
+        states: per-cohort states of an earlier run (see load_ltv_states); cohorts found
+        there are updated incrementally, the others predicted in full.
+        """
+        groups = list(self.raw_data.groupby(self.cohort_keys, sort=True))
+        states = states or {}
+        known = sum(1 for key, _ in groups if state_key(key) in states)
+        logger.info(f"Predicting LTV for {len(groups)} cohorts ({known} incremental)...")
+
+        if workers > 1 and len(groups) > 1:
+            # A few batches per worker amortize the pickling overhead while keeping the load balanced
+            size = -(-len(groups) // (workers * 4))
+            batches = [groups[i:i + size] for i in range(0, len(groups), size)]
+            repeat = lambda v: [v] * len(batches)
+            # Only the states of each batch's own cohorts are pickled to its worker
+            batch_states = [{state_key(k): states[state_key(k)] for k, _ in batch if state_key(k) in states} for batch in batches]
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                outcomes = [o for batch in pool.map(_predict_cohorts, batches, repeat(ecpnu), repeat(net_rate), repeat(self.service_options), batch_states) for o in batch]
+        else:
+            outcomes = _predict_cohorts(groups, ecpnu, net_rate, self.service_options, states)
+
+        results, benchmarks, metrics = [], [], []
+        self.failed = []
+        self.states = {}
+        for key, result, bench, fit_metrics, state, error in outcomes:
+            if error is not None:
+                logger.error(f"Cohort {key} failed: {error}")
+                self.failed.append(key)
+                continue
+            results.append(result)
+            benchmarks.append(bench)
+            metrics.append(fit_metrics)
+            self.states[state_key(key)] = state
+
+        fitted = [m for m in metrics if m]
+        converged = sum(1 for m in fitted if m["converged"])
+        self.fit_metrics = {
+            "method": self.fit_method,
+            "cohorts": len(fitted),
+            "converged": converged,
+            "convergence_rate": converged / len(fitted) if fitted else 0.0,
+            "fit_seconds": sum(m["fit_seconds"] for m in fitted),
+        }
+        logger.info(f"Predicted {len(results)} cohorts ({len(self.failed)} failed).")
+        logger.info(
+            f"Retention fit ({self.fit_method}): {converged}/{len(fitted)} converged "
+            f"({self.fit_metrics['convergence_rate']:.1%}), {self.fit_metrics['fit_seconds']:.2f}s fitting."
+        )
+        self.results_df = pd.concat(results, ignore_index=True) if results else pd.DataFrame()
+        self.benchmarks_df = pd.concat(benchmarks, ignore_index=True) if benchmarks else pd.DataFrame()
+        return self.results_df
+
+    def get_summary_benchmarks(self) -> pd.DataFrame:
+        """Benchmark days of every cohort, as returned by LTVService.get_summary_benchmarks."""
+        if self.benchmarks_df is None: return pd.DataFrame()
+        return self.benchmarks_df
+
+def state_key(key) -> str:
+    """JSON key of a cohort: its key values joined by '|'."""
+    return "|".join(str(k) for k in key) if isinstance(key, tuple) else str(key)
+
+def load_ltv_states(path):
+    """Per-cohort LTV states saved by save_ltv_states; empty when missing or unreadable."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            states = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {k: v for k, v in states.items() if isinstance(v, dict) and v.get("version") == STATE_VERSION}
+
+def save_ltv_states(path, states):
+    """Writes the per-cohort states atomically (floats round-trip exactly through JSON)."""
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(states, f)
+    os.replace(tmp, path)
+
+def _predict_cohorts(groups, ecpnu, net_rate, service_options=None, states=None):
+    """
+    Process pool entry point: predicts a batch of (key, DataFrame) cohorts.
+    Cohorts with an entry in states are updated incrementally instead.
+    """
+    states = states or {}
+    position = {state_key(key): row for row, (key, _) in enumerate(groups)}
+    outcomes = []
+    for key, df in groups:
+        state = states.get(state_key(key))
+        if state is None:
+            continue
+        try:
+            service = LTVService(df.reset_index(drop=True), **(service_options or {}))
+            result = service.update(state, ecpnu=ecpnu, net_rate=net_rate)
+            outcomes.append((key, result, service.get_summary_benchmarks(), service.fit_metrics, service.state, None))
+        except Exception as e:
+            outcomes.append((key, None, None, None, None, str(e)))
+    groups = [(key, df) for key, df in groups if state_key(key) not in states]
+
+    # ARPU of the whole batch is projected in one vectorized pass
+    lengths = [len(df) for _, df in groups]
+    padded = np.full((len(groups), max(lengths, default=0)), np.nan)
+    for row, (_, df) in enumerate(groups):
+        padded[row, :lengths[row]] = df['actual_arpu'].values
+    predicted_arpu = project_arpu(padded)[0]
+
+    # Closed-form retention fits of the whole batch, also one vectorized pass
+    start = time.perf_counter()
+    points = [retention_points(df) for _, df in groups]
+    width = max((len(x) for x, _ in points), default=0)
+    x_pad, y_pad = np.full((len(groups), width), np.nan), np.full((len(groups), width), np.nan)
+    for row, (x, y) in enumerate(points):
+        x_pad[row, :len(x)], y_pad[row, :len(y)] = x, y
+    guess_a, guess_b = fit_power_law(x_pad, y_pad)
+    closed_form_share = (time.perf_counter() - start) / max(len(groups), 1)
+
+    for row, (key, df) in enumerate(groups):
+        try:
+            service = LTVService(df.reset_index(drop=True), **(service_options or {}))
+            result = service.predict(
+                ecpnu=ecpnu, net_rate=net_rate, predicted_arpu=predicted_arpu[row],
+                retention_guess=(guess_a[row], guess_b[row])
+            )
+            if service.fit_metrics:
+                service.fit_metrics["fit_seconds"] += closed_form_share
+            outcomes.append((key, result, service.get_summary_benchmarks(), service.fit_metrics, service.state, None))
+        except Exception as e:
+            outcomes.append((key, None, None, None, None, str(e)))
+    return sorted(outcomes, key=lambda o: position[state_key(o[0])])
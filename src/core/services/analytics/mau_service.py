@@ -2,69 +2,172 @@ import pandas as pd
 import numpy as np
 from src.utils.logger import logger
 
+# Order of the segments in the state vector and the transition matrix
+SEGMENTS = ("nuu", "ouu", "ruu", "churned")
+# Months of history used as the baseline
+BASELINE_MONTHS = 6
+
 class MAUService:
     """
     MAU (Monthly Active Users) Prediction Service.
-    Uses historical NUU/OUU/RUU and retention rates to predict future growth.
+    Projects a month-to-month Markov chain over four segments:
+    new (nuu) -> old (ouu) -> churned -> returning (ruu).
+
+    Each month the active segments either stay active (becoming old users, at their
+    retention rate) or move to the churned pool; a share of the churned pool comes
+    back as returning users; new users arrive at the baseline rate times growth_factor.
+    With x = [nuu, ouu, ruu, churned] this is x(t+1) = A x(t) + b, projected for many
+    scenarios at once as a batch of matrices.
     """
     def __init__(self, data: pd.DataFrame):
         self.raw_data = data.copy()
         self.results_df = None
+        self.baseline = None
 
-    def predict(self, months_to_predict: int = 12, growth_factor: float = 1.0) -> pd.DataFrame:
-        """
-        Predicts MAU for future months.
-        growth_factor: Multiplier for NUU (New User Units)
-        """
+    def _history(self):
         df = self.raw_data.copy()
         df['data_date'] = pd.to_datetime(df['data_date'])
-        df = df.sort_values('data_date').tail(6) # Use last 6 months as baseline
+        df = df.sort_values('data_date').reset_index(drop=True)
+        for col in ('nuu', 'ouu', 'ruu'):
+            df[col] = df[col].astype(float)
+        df['mau'] = df['nuu'] + df['ouu'] + df['ruu']
+        return df
+
+    def _fit_baseline(self, df):
+        """
+        Transition rates from the last BASELINE_MONTHS months.
+        The churned pool is not observed; it is rebuilt from the history as the running
+        sum of users lost minus users returning, starting just large enough never to go
+        negative. The reactivation rate is the share of that pool returning next month.
+        """
+        nuu, ouu, ruu, mau = (df[c].values for c in ('nuu', 'ouu', 'ruu', 'mau'))
+        rate_cols = ('nuu_retention_rate', 'ouu_retention_rate', 'ruu_retention_rate')
+        if all(c in df.columns for c in rate_cols):
+            rates = np.column_stack([df[c].values.astype(float) for c in rate_cols])
+        else:
+            # Without per-segment rates every active user keeps the implied rate ouu(t+1) / mau(t)
+            implied = np.divide(ouu[1:], mau[:-1], out=np.zeros(len(df) - 1), where=mau[:-1] > 0)
+            implied = np.append(implied, implied[-1] if len(implied) else 0.0)
+            rates = np.repeat(implied[:, None], 3, axis=1)
+            logger.warning("MAU: retention rate columns missing, using the implied retention ouu(t+1) / mau(t).")
+        rates = np.clip(rates, 0.0, 1.0)
+
+        lost = ((1 - rates) * np.column_stack([nuu, ouu, ruu])).sum(axis=1)
+        # churned(t) = churned(t-1) + lost(t-1) - ruu(t)
+        flow = np.concatenate([[0.0], lost[:-1] - ruu[1:]])
+        churned = np.cumsum(flow)
+        churned -= min(churned.min(), 0.0)
+
+        window = slice(-BASELINE_MONTHS, None)
+        pool, returned = churned[:-1][window], ruu[1:][window]
+        usable = pool > 0
+        reactivation = float(np.clip(np.mean(returned[usable] / pool[usable]), 0.0, 1.0)) if usable.any() else 0.0
+
+        retention = rates[window].mean(axis=0)
+        return {
+            "nuu": float(nuu[window].mean()),
+            "nuu_retention_rate": float(retention[0]),
+            "ouu_retention_rate": float(retention[1]),
+            "ruu_retention_rate": float(retention[2]),
+            "reactivation_rate": reactivation,
+            "state": np.array([nuu[-1], ouu[-1], ruu[-1], churned[-1]]),
+            "churned": churned,
+        }
 
+    def transition_matrices(self, retention_factors, baseline=None):
+        """
+        Transition matrix of every scenario, shape (scenarios, 4, 4), with the retention
+        rates scaled by retention_factors (capped at 1). Column j is where segment j goes.
+        """
+        baseline = baseline or self.baseline
+        factors = np.asarray(retention_factors, dtype=float)
+        retained = np.minimum(
+            np.array([baseline["nuu_retention_rate"], baseline["ouu_retention_rate"], baseline["ruu_retention_rate"]]) * factors[:, None],
+            1.0,
+        )
+        q = baseline["reactivation_rate"]
+        matrices = np.zeros((len(factors), 4, 4))
+        matrices[:, 1, :3] = retained
+        matrices[:, 3, :3] = 1 - retained
+        matrices[:, 2, 3] = q
+        matrices[:, 3, 3] = 1 - q
+        return matrices
+
+    def project(self, months_to_predict: int = 12, growth_factors=(1.0,), retention_factors=(1.0,)) -> np.ndarray:
+        """
+        Projects every (growth_factor, retention_factor) pair in one batched computation.
+        The two sequences are paired element-wise (use scenario_grid for a full grid).
+        Returns an array of shape (scenarios, months, 4) in SEGMENTS order.
+        """
+        df = self._history()
         if df.empty:
-            logger.error("No historical data for MAU prediction.")
+            raise ValueError("No historical data for MAU prediction.")
+        self.baseline = self._fit_baseline(df)
+
+        growth = np.asarray(growth_factors, dtype=float)
+        matrices = self.transition_matrices(retention_factors)
+        inflow = np.zeros((len(growth), 4))
+        inflow[:, 0] = self.baseline["nuu"] * growth
+
+        states = np.empty((len(growth), months_to_predict, 4))
+        x = np.broadcast_to(self.baseline["state"], (len(growth), 4))
+        for month in range(months_to_predict):
+            x = np.einsum('sij,sj->si', matrices, x) + inflow
+            states[:, month] = x
+        return states
+
+    def predict(self, months_to_predict: int = 12, growth_factor: float = 1.0, retention_factor: float = 1.0) -> pd.DataFrame:
+        """
+        Predicts MAU for future months.
+        growth_factor: Multiplier for NUU (New User Units)
+        retention_factor: Multiplier for the nuu/ouu/ruu retention rates
+        """
+        try:
+            states = self.project(months_to_predict, [growth_factor], [retention_factor])[0]
+        except ValueError as e:
+            logger.error(str(e))
             return pd.DataFrame()
 
-        # Calculate baseline averages
-        avg_nuu = df['nuu'].mean() * growth_factor
-        avg_nuu_rr = df['nuu_retention_rate'].mean()
-        avg_ouu_rr = df['ouu_retention_rate'].mean()
-        avg_ruu_rr = df['ruu_retention_rate'].mean()
-
-        last_date = df['data_date'].iloc[-1]
-        last_mau = df['nuu'].iloc[-1] + df['ouu'].iloc[-1] + df['ruu'].iloc[-1]
-        
-        predictions = []
-        current_date = last_date
-
-        for i in range(months_to_predict):
-            current_date = current_date + pd.DateOffset(months=1)
-            
-            # Simplified MAU projection logic
-            # Predicted MAU = New + (Existing * Decay) + (Returning)
-            # In professional models, this is a Markov chain or Cohort analysis
-            pred_nuu = avg_nuu
-            pred_ouu = last_mau * avg_ouu_rr # Rough decay of previous MAU
-            pred_ruu = avg_nuu * 0.1 # Dynamic returning users (placeholder)
-            
-            pred_mau = pred_nuu + pred_ouu + pred_ruu
-            
-            predictions.append({
-                'data_date': current_date,
-                'nuu': pred_nuu,
-                'ouu': pred_ouu,
-                'ruu': pred_ruu,
-                'mau': pred_mau,
-                'is_predicted': True
-            })
-            last_mau = pred_mau
-
-        pred_df = pd.DataFrame(predictions)
-        
-        # Merge with history
-        history_df = self.raw_data.copy()
-        history_df['data_date'] = pd.to_datetime(history_df['data_date'])
-        history_df['mau'] = history_df['nuu'] + history_df['ouu'] + history_df['ruu']
+        history_df = self._history()
+        history_df['churned'] = self.baseline["churned"]
         history_df['is_predicted'] = False
-        
+
+        pred_df = pd.DataFrame(states, columns=list(SEGMENTS))
+        pred_df.insert(0, 'data_date', _future_dates(history_df['data_date'].iloc[-1], months_to_predict))
+        pred_df['mau'] = pred_df['nuu'] + pred_df['ouu'] + pred_df['ruu']
+        pred_df['is_predicted'] = True
+
+        b = self.baseline
+        logger.info(
+            f"MAU transitions: retention new {b['nuu_retention_rate']:.1%} / old {b['ouu_retention_rate']:.1%} / "
+            f"returning {b['ruu_retention_rate']:.1%}, reactivation {b['reactivation_rate']:.1%} of the churned pool"
+        )
         self.results_df = pd.concat([history_df, pred_df], ignore_index=True)
         return self.results_df
+
+    def sweep(self, growth_factors, retention_factors, months_to_predict: int = 12) -> pd.DataFrame:
+        """
+        Scenario sweep over the full grid of growth_factors x retention_factors.
+        Returns one row per scenario and month (long format).
+        """
+        growth, retention = scenario_grid(growth_factors, retention_factors)
+        states = self.project(months_to_predict, growth, retention)
+        scenarios, months = states.shape[:2]
+
+        result = pd.DataFrame(states.reshape(-1, 4), columns=list(SEGMENTS))
+        result['mau'] = result['nuu'] + result['ouu'] + result['ruu']
+        result.insert(0, 'data_date', np.tile(_future_dates(self._history()['data_date'].iloc[-1], months), scenarios))
+        result.insert(0, 'retention_factor', np.repeat(retention, months))
+        result.insert(0, 'growth_factor', np.repeat(growth, months))
+        result.insert(0, 'scenario', np.repeat(np.arange(scenarios), months))
+        logger.info(f"MAU sweep: {scenarios} scenarios x {months} months projected.")
+        self.results_df = result
+        return result
+
+def scenario_grid(growth_factors, retention_factors):
+    """Every (growth_factor, retention_factor) combination as two flat arrays."""
+    growth, retention = np.meshgrid(np.asarray(growth_factors, dtype=float), np.asarray(retention_factors, dtype=float), indexing='ij')
+    return growth.ravel(), retention.ravel()
+
+def _future_dates(last_date, months):
+    return pd.DatetimeIndex([last_date + pd.DateOffset(months=i + 1) for i in range(months)])
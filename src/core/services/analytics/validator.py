@@ -34,6 +34,24 @@ class DataValidator:
         logger.info(f"Data validated: {len(df)} rows ready for LTV prediction.")
         return df
 
+    @staticmethod
+    def clean_ltv_cohort_data(df: pd.DataFrame, cohort_keys) -> pd.DataFrame:
+        """
+        Cleans a long-format table of many LTV cohorts.
+        Expected columns: the cohort key columns plus num_day, actual_rr, actual_arpu
+        """
+        missing = [c for c in cohort_keys if c not in df.columns]
+        if missing:
+            raise ValueError(f"Missing cohort key columns for LTV: {missing}")
+
+        df = DataValidator.clean_ltv_data(df)
+        df = df.dropna(subset=list(cohort_keys))
+
+        # Sort by cohort, then num_day (stable sort keeps the day order)
+        df = df.sort_values(list(cohort_keys), kind='mergesort')
+        logger.info(f"Cohorts found: {df.groupby(list(cohort_keys)).ngroups}")
+        return df
+
     @staticmethod
     def clean_mau_data(df: pd.DataFrame) -> pd.DataFrame:
         """
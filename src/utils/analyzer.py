@@ -1,75 +1,133 @@
 import csv
+import io
 import os
+import re
+import json
+import mmap
 import time
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from src.utils.logger import logger
 
+# Upper bound on the bytes a single parallel scan task decodes at once
+MAX_RANGE_BYTES = 64 * 1024 * 1024
+# Bytes per record batch in the columnar scan
+COLUMN_BLOCK_BYTES = 16 * 1024 * 1024
+# Characters of decompressed text handed to a worker per task
+STREAM_BLOCK_CHARS = 16 * 1024 * 1024
+# Leading bytes of the compressed formats that are scanned through streaming decompression
+COMPRESSION_MAGIC = {b"\x1f\x8b": "gzip", b"\x28\xb5\x2f\xfd": "zstd"}
+
+class IdMatcher:
+    """
+    Finds which of many IDs occur as substrings of a text in one regex pass,
+    instead of testing every ID against the text separately.
+    """
+    # Up to this many IDs, plain substring checks beat the overlapping regex scan
+    DIRECT_LIMIT = 8
+
+    def __init__(self, ids):
+        self.ids = [tid for tid in dict.fromkeys(ids) if tid]
+        pattern = self.pattern = _trie_pattern(self.ids)
+        # Raw lines carry quotes doubled, so the prefilter also looks for the escaped form
+        raw_ids = self.ids + [tid.replace('"', '""') for tid in self.ids if '"' in tid]
+        self._any = re.compile(_trie_pattern(raw_ids)) if self.ids else None
+        self._all = re.compile(f"(?=({pattern}))") if self.ids else None
+        # Any other ID matching at the same position is a prefix of that longest one
+        self._prefixes = {tid: {t for t in self.ids if tid.startswith(t)} for tid in self.ids}
+
+    def search(self, text):
+        """True if any ID occurs in text."""
+        return self._any is not None and self._any.search(text) is not None
+
+    def locate(self, text):
+        """Yields (position, ids) for every position of text at which at least one ID starts."""
+        if self._all is None:
+            return
+        for m in self._all.finditer(text):
+            yield m.start(), self._prefixes[m.group(1)]
+
+    def find(self, text):
+        """Returns the IDs occurring in text, in the order they were given."""
+        if len(self.ids) <= self.DIRECT_LIMIT:
+            return [tid for tid in self.ids if tid in text]
+        found = set()
+        for m in self._all.finditer(text):
+            found |= self._prefixes[m.group(1)]
+        return [tid for tid in self.ids if tid in found]
+
+def _trie_pattern(ids):
+    """
+    Builds a regex equivalent to an alternation of ids, but shaped like a trie so
+    shared prefixes are only matched once. At any position the longest matching
+    ID wins, as the optional suffixes are greedy.
+    """
+    trie = {}
+    for tid in ids:
+        node = trie
+        for ch in tid:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
 class LogAnalyzer:
     """
     Core logic for analyzing large CSV logs to find specific IDs.
     Separated from CLI interface for reusability.
     """
-    
+
     # Standard event name headers for different platforms
     EVENT_COLUMN_CANDIDATES = ['#event_name', '$part_event', 'event_name', 'a_typ']
 
     @staticmethod
-    def analyze_csv(csv_path, target_ids):
+    def analyze_csv(csv_path, target_ids, workers=1, use_index=True, context=0, columns=None):
         """
         Analyzes a CSV file and returns a structured report of ID occurrences.
+        With workers > 1 the file is split into byte ranges scanned by a process pool.
+        With columns, only those columns (plus the event columns) are read and
+        matched, vectorized with pyarrow.
+        If a fresh LogIndex sidecar exists it answers the IDs it can, and up to
+        `context` matching rows per ID are fetched from the file as samples. An
+        index over some columns only searches those, unless columns asks for others.
         """
         if not os.path.exists(csv_path):
             raise FileNotFoundError(f"CSV file not found: {csv_path}")
 
         logger.info(f"Analyzing file: {os.path.basename(csv_path)}")
         logger.info(f"Target IDs: {', '.join(target_ids)}")
-        
+
         start_time = time.time()
-        results = {tid: {} for tid in target_ids}
-        row_count = 0
-        
+        samples = {}
+        index = LogIndex.load(csv_path) if use_index else None
+        if index is not None and columns and not index.covers(columns):
+            logger.info(f"Index covers only {', '.join(index.columns)}, scanning instead.")
+            index = None
+        elif index is not None and index.partial and not columns:
+            logger.info(f"Index covers only {', '.join(index.columns)}; other columns are not searched (scan with use_index=False).")
+
         try:
-            # Use utf-8-sig to handle potential BOM
-            with open(csv_path, 'r', encoding='utf-8-sig') as f:
-                reader = csv.reader(f)
-                header = next(reader)
-                
-                # Identify event name columns
-                event_indices = [
-                    idx for idx, name in enumerate(header) 
-                    if name.lower() in [c.lower() for c in LogAnalyzer.EVENT_COLUMN_CANDIDATES]
-                ]
-                
-                # Fallback to index 1 (common convention) if no matches
-                if not event_indices:
-                    event_indices = [1]
-                
-                detected_names = [header[i] for i in event_indices if i < len(header)]
-                logger.info(f"Monitoring event columns: {detected_names}")
-                
-                for row in reader:
-                    row_count += 1
-                    if row_count % 500000 == 0:
-                        logger.info(f"Processed {row_count:,} rows...")
-                    
-                    # Iterate through each column for substring matching
-                    for col_idx, cell_value in enumerate(row):
-                        if not cell_value:
-                            continue
-                            
-                        for tid in target_ids:
-                            if tid in cell_value:
-                                # Determine event name
-                                event_name = "Unknown"
-                                for e_idx in event_indices:
-                                    if e_idx < len(row) and row[e_idx].strip():
-                                        event_name = row[e_idx]
-                                        break
-                                        
-                                col_name = header[col_idx] if col_idx < len(header) else f"Column_{col_idx}"
-                                
-                                key = (event_name, col_name)
-                                results[tid][key] = results[tid].get(key, 0) + 1
-                                
+            if index is not None:
+                indexed = [tid for tid in target_ids if LogIndex.indexable(tid)]
+                results, rows = index.lookup(indexed, context, columns)
+                samples = {tid: list(zip(rows[tid], index.read_rows(rows[tid]))) for tid in indexed if rows[tid]}
+                row_count = index.rows
+                rest = [tid for tid in target_ids if tid not in results]
+                if rest:
+                    logger.info(f"IDs not covered by the index, scanning for: {', '.join(rest)}")
+                    scanned, _ = LogAnalyzer._scan(csv_path, rest, workers, columns)
+                    results.update(scanned)
+                results = {tid: results[tid] for tid in target_ids}
+            else:
+                results, row_count = LogAnalyzer._scan(csv_path, target_ids, workers, columns)
         except Exception as e:
             logger.error(f"Error during CSV analysis: {e}")
             raise
@@ -77,9 +135,609 @@ class LogAnalyzer:
         duration = time.time() - start_time
         return {
             "results": results,
+            "samples": samples,
             "metadata": {
                 "file": os.path.basename(csv_path),
                 "rows": row_count,
-                "duration": duration
+                "duration": duration,
+                "source": "scan" if index is None else f"index ({', '.join(index.columns)})" if index.partial else "index"
             }
         }
+
+    @staticmethod
+    def build_index(csv_path, columns=None):
+        """Builds (or rebuilds) the LogIndex sidecar of csv_path over columns (default: the ID columns)."""
+        if not os.path.exists(csv_path):
+            raise FileNotFoundError(f"CSV file not found: {csv_path}")
+        logger.info(f"Building index for: {os.path.basename(csv_path)}")
+        return LogIndex.build(csv_path, columns)
+
+    @staticmethod
+    def _scan(csv_path, target_ids, workers=1, columns=None):
+        if columns:
+            return LogAnalyzer._scan_columns(csv_path, target_ids, columns)
+        if workers > 1 and os.path.getsize(csv_path) > 0:
+            if detect_compression(csv_path):
+                return LogAnalyzer._scan_stream_parallel(csv_path, target_ids, workers)
+            return LogAnalyzer._scan_parallel(csv_path, target_ids, workers)
+        return LogAnalyzer._scan_file(csv_path, target_ids)
+
+    @staticmethod
+    def _scan_file(csv_path, target_ids):
+        results = {tid: {} for tid in target_ids}
+        with open_log(csv_path) as f:
+            records = iter_records(f)
+            header = parse_record(next(records))
+            event_indices = LogAnalyzer.event_indices(header)
+
+            detected_names = [header[i] for i in event_indices if i < len(header)]
+            logger.info(f"Monitoring event columns: {detected_names}")
+
+            row_count = scan_records(records, header, event_indices, IdMatcher(target_ids), results, log_every=500000)
+        return results, row_count
+
+    @staticmethod
+    def _scan_parallel(csv_path, target_ids, workers):
+        with open(csv_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            header_end, _ = _record_end(mm, 0, len(mm), False)
+            header = parse_record(mm[:header_end].decode('utf-8-sig'))
+            parts = max(workers, -(-(len(mm) - header_end) // MAX_RANGE_BYTES))
+            ranges = split_ranges(mm, header_end, len(mm), parts)
+
+        event_indices = LogAnalyzer.event_indices(header)
+        detected_names = [header[i] for i in event_indices if i < len(header)]
+        logger.info(f"Monitoring event columns: {detected_names}")
+        logger.info(f"Scanning {len(ranges)} byte ranges on {workers} processes...")
+
+        partials = [None] * len(ranges)
+        row_count = 0
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(_scan_range, csv_path, start, end, header, event_indices, target_ids): idx
+                for idx, (start, end) in enumerate(ranges)
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                partials[futures[future]], rows = future.result()
+                row_count += rows
+                logger.info(f"Processed {row_count:,} rows ({done}/{len(ranges)} ranges)...")
+
+        # Merged in file order so keys keep the order of their first occurrence
+        results = {tid: {} for tid in target_ids}
+        for partial in partials:
+            _merge_results(results, partial)
+        return results, row_count
+
+    @staticmethod
+    def _scan_stream_parallel(csv_path, target_ids, workers):
+        """
+        Parallel scan of a compressed file. Decompressed text is cut into record-aligned
+        blocks on this thread while the process pool scans the previous ones; at most
+        2 blocks per worker are in flight, so memory does not grow with the file.
+        """
+        results = {tid: {} for tid in target_ids}
+        row_count = 0
+        pending = deque()
+
+        def merge(future):
+            nonlocal row_count
+            partial, rows = future.result()
+            _merge_results(results, partial)
+            row_count += rows
+            logger.info(f"Processed {row_count:,} rows...")
+
+        with open_log(csv_path) as f, ProcessPoolExecutor(max_workers=workers) as pool:
+            header = parse_record(next(iter_records(f)))
+            event_indices = LogAnalyzer.event_indices(header)
+            detected_names = [header[i] for i in event_indices if i < len(header)]
+            logger.info(f"Monitoring event columns: {detected_names}")
+            logger.info(f"Scanning {detect_compression(csv_path)} stream on {workers} processes...")
+
+            carry = ""
+            while True:
+                block = f.read(STREAM_BLOCK_CHARS)
+                text = carry + block
+                cut = _last_record_end(text) if block else len(text)
+                carry, text = text[cut:], text[:cut]
+                if text:
+                    pending.append(pool.submit(_scan_text, text, header, event_indices, target_ids))
+                if not block:
+                    break
+                while len(pending) >= workers * 2:
+                    merge(pending.popleft())
+            while pending:
+                merge(pending.popleft())
+        return results, row_count
+
+    @staticmethod
+    def _scan_columns(csv_path, target_ids, columns):
+        try:
+            import pyarrow as pa
+            import pyarrow.compute as pc
+            import pyarrow.csv as pv
+        except ImportError:
+            logger.error("Module 'pyarrow' not found. Please install pyarrow.")
+            raise
+
+        with open_log(csv_path) as f:
+            header = parse_record(next(iter_records(f)))
+        missing = [c for c in columns if c not in header]
+        if missing:
+            raise ValueError(f"Columns not found in {os.path.basename(csv_path)}: {', '.join(missing)}")
+
+        event_columns = [header[i] for i in LogAnalyzer.event_indices(header) if i < len(header)]
+        read_columns = list(dict.fromkeys(list(columns) + event_columns))
+        logger.info(f"Monitoring event columns: {event_columns}")
+        logger.info(f"Reading columns: {read_columns}")
+
+        results = {tid: {} for tid in target_ids}
+        matcher = IdMatcher(target_ids)
+        row_count = 0
+        codec = detect_compression(csv_path)
+        reader = pv.open_csv(
+            pa.input_stream(csv_path, compression=codec) if codec else csv_path,
+            read_options=pv.ReadOptions(block_size=COLUMN_BLOCK_BYTES),
+            parse_options=pv.ParseOptions(newlines_in_values=True),
+            convert_options=pv.ConvertOptions(
+                include_columns=read_columns,
+                column_types={c: pa.string() for c in read_columns},
+                strings_can_be_null=False
+            )
+        )
+        for batch in reader:
+            row_count += batch.num_rows
+            # First non-blank event column, as in event_name()
+            events = pa.scalar("Unknown")
+            for col in reversed(event_columns):
+                values = batch.column(col)
+                events = pc.if_else(pc.not_equal(pc.utf8_trim_whitespace(values), ""), values, events)
+            if not isinstance(events, (pa.Array, pa.ChunkedArray)):
+                events = pa.array(["Unknown"] * batch.num_rows)
+
+            for col in columns:
+                values, col_events = batch.column(col), events
+                if len(matcher.ids) > IdMatcher.DIRECT_LIMIT:
+                    # Narrow down to cells containing any ID before matching them one by one
+                    candidates = pc.match_substring_regex(values, matcher.pattern)
+                    values, col_events = pc.filter(values, candidates), pc.filter(col_events, candidates)
+                for tid in matcher.ids:
+                    hits = pc.filter(col_events, pc.match_substring(values, tid))
+                    if not len(hits):
+                        continue
+                    for item in pc.value_counts(hits).to_pylist():
+                        key = (item["values"], col)
+                        results[tid][key] = results[tid].get(key, 0) + item["counts"]
+            if row_count // 500000 != (row_count - batch.num_rows) // 500000:
+                logger.info(f"Processed {row_count:,} rows...")
+        return results, row_count
+
+    @staticmethod
+    def event_indices(header):
+        """Indices of the event name columns in header."""
+        candidates = [c.lower() for c in LogAnalyzer.EVENT_COLUMN_CANDIDATES]
+        indices = [idx for idx, name in enumerate(header) if name.lower() in candidates]
+        # Fallback to index 1 (common convention) if no matches
+        return indices or [1]
+
+def detect_compression(path):
+    """Returns "gzip" or "zstd" if path starts with that format's magic bytes, else None."""
+    with open(path, 'rb') as f:
+        head = f.read(4)
+    for magic, codec in COMPRESSION_MAGIC.items():
+        if head.startswith(magic):
+            return codec
+    return None
+
+def open_log(path, text=True):
+    """
+    Opens a CSV log for sequential reading. gzip and zstd files are decompressed
+    on the fly through pyarrow's streaming codecs, so memory use stays constant.
+    """
+    codec = detect_compression(path)
+    if codec is None:
+        # Use utf-8-sig to handle potential BOM; newline='' keeps quoted line breaks intact
+        return open(path, 'r', encoding='utf-8-sig', newline='') if text else open(path, 'rb')
+    try:
+        import pyarrow as pa
+    except ImportError:
+        logger.error("Module 'pyarrow' not found. Please install pyarrow.")
+        raise
+    stream = pa.input_stream(path, compression=codec)
+    return io.TextIOWrapper(stream, encoding='utf-8-sig', newline='') if text else io.BufferedReader(stream)
+
+def iter_records(lines):
+    """
+    Groups physical lines into CSV records. A line that leaves a quoted field
+    open is joined with the following lines until the quotes balance.
+    """
+    pending = None
+    for line in lines:
+        if pending is not None:
+            pending += line
+            if pending.count('"') % 2 == 0:
+                yield pending
+                pending = None
+        elif line.count('"') % 2:
+            pending = line
+        else:
+            yield line
+    if pending is not None:
+        yield pending
+
+def scan_records(records, header, event_indices, matcher, results, log_every=None):
+    """Counts the matches of every record into results and returns the number of rows seen."""
+    row_count = 0
+
+    def candidates():
+        nonlocal row_count
+        for record in records:
+            row_count += 1
+            if log_every and row_count % log_every == 0:
+                logger.info(f"Processed {row_count:,} rows...")
+
+            # Reject the row on the raw line before paying for csv parsing
+            if matcher.search(record):
+                yield record
+
+    for row in csv.reader(candidates()):
+        count_matches(row, header, event_indices, matcher, results)
+    return row_count
+
+def _scan_range(csv_path, start, end, header, event_indices, target_ids):
+    """Process pool entry point: scans the records in bytes [start, end) of csv_path."""
+    with open(csv_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        text = mm[start:end].decode('utf-8')
+    return _scan_text(text, header, event_indices, target_ids)
+
+def _scan_text(text, header, event_indices, target_ids):
+    """Process pool entry point: scans a block of whole records."""
+    results = {tid: {} for tid in target_ids}
+    records = iter_records(io.StringIO(text, newline=''))
+    row_count = scan_records(records, header, event_indices, IdMatcher(target_ids), results)
+    return results, row_count
+
+def _merge_results(results, partial):
+    for tid, locations in partial.items():
+        merged = results[tid]
+        for key, count in locations.items():
+            merged[key] = merged.get(key, 0) + count
+
+def _last_record_end(text):
+    """Offset just past the last newline of text that lies outside any quoted field (0 if none)."""
+    pos = text.rfind('\n')
+    while pos >= 0 and text.count('"', 0, pos) % 2:
+        pos = text.rfind('\n', 0, pos)
+    return pos + 1
+
+def split_ranges(mm, start, end, parts):
+    """
+    Splits bytes [start, end) of a mapped CSV into about `parts` ranges that each
+    begin at a record boundary, i.e. after a newline outside any quoted field.
+    """
+    bounds = [start]
+    pos, inside = start, False
+    for i in range(1, parts):
+        target = start + (end - start) * i // parts
+        if target <= pos:
+            continue
+        inside ^= _count_quotes(mm, pos, target) % 2 == 1
+        pos, inside = _record_end(mm, target, end, inside)
+        if pos >= end:
+            break
+        bounds.append(pos)
+    bounds.append(end)
+    return list(zip(bounds, bounds[1:]))
+
+def _record_end(mm, pos, end, inside):
+    """Returns the offset just past the first newline at or after pos that ends a record."""
+    while True:
+        nl = mm.find(b'\n', pos, end)
+        if nl < 0:
+            return end, False
+        inside ^= _count_quotes(mm, pos, nl + 1) % 2 == 1
+        pos = nl + 1
+        if not inside:
+            return pos, False
+
+def _count_quotes(mm, start, end, block=64 * 1024 * 1024):
+    return sum(mm[i:min(i + block, end)].count(b'"') for i in range(start, end, block))
+
+def parse_record(record):
+    return next(csv.reader([record]), [])
+
+def count_matches(row, header, event_indices, matcher, results):
+    """Adds the (event name, column) of every cell in row containing a target ID to results."""
+    for col_idx, cell_value in enumerate(row):
+        if not cell_value:
+            continue
+
+        for tid in matcher.find(cell_value):
+            key = (event_name(row, event_indices), column_name(header, col_idx))
+            results[tid][key] = results[tid].get(key, 0) + 1
+
+def event_name(row, event_indices):
+    """The first non-blank event column of row, or "Unknown"."""
+    for e_idx in event_indices:
+        if e_idx < len(row) and row[e_idx].strip():
+            return row[e_idx]
+    return "Unknown"
+
+def column_name(header, col_idx):
+    return header[col_idx] if col_idx < len(header) else f"Column_{col_idx}"
+
+class LogIndex:
+    """
+    Inverted index sidecar of a CSV log, stored next to it as <file>.seekidx.npz.
+    Every token of the indexed columns maps to the cells containing it; each row keeps
+    its event name and byte offset. An ID made only of token characters always lies
+    inside a single token, so its occurrences are found by matching it against the
+    vocabulary instead of the file. Only ID columns are indexed by default (timestamps
+    and free text would make the sidecar as large as the log); postings are stored as
+    per-token row deltas and the arrays compressed. The index is stale once the file's
+    size or mtime changes.
+    """
+    SUFFIX = ".seekidx.npz"
+    VERSION = 2
+    # Maximal runs of these characters are the indexed tokens
+    TOKEN_RE = re.compile(r"[\w\-.@]+")
+    # Shorter tokens are not indexed, which keeps the sidecar small; shorter IDs are scanned for
+    MIN_TOKEN_LEN = 3
+    # Column names indexed by default: id, uid, openid, #account_id, #distinct_id, role_id, ...
+    ID_COLUMN_RE = re.compile(r"(?:^|[#$_\s])(?:\w*_)?(?:id|uid|openid)$", re.IGNORECASE)
+    # Cells are packed as row << COL_BITS | column while looking up
+    COL_BITS = 16
+    # Arrays read on every seek; row_sizes is only needed for context rows
+    LOOKUP_ARRAYS = ("vocab", "vocab_lengths", "token_counts", "row_deltas", "cell_cols", "row_events")
+
+    def __init__(self, csv_path, meta, arrays):
+        import numpy as np
+        self.csv_path = csv_path
+        self.meta = meta
+        self.header = meta["header"]
+        self.events = meta["events"]
+        self.columns = [self.header[i] for i in meta["columns"]]
+        self.arrays = arrays
+        self.vocab = arrays["vocab"]
+        self.vocab_starts = np.concatenate([[0], np.cumsum(arrays["vocab_lengths"] + 1, dtype=np.int64)[:-1]])
+        self.token_starts = np.concatenate([[0], np.cumsum(arrays["token_counts"], dtype=np.int64)])
+        self.row_deltas = arrays["row_deltas"]
+        self.cell_cols = arrays["cell_cols"]
+        self.row_events = arrays["row_events"]
+        self._row_offsets = None
+
+    @property
+    def rows(self):
+        return len(self.row_events)
+
+    @property
+    def row_offsets(self):
+        """Byte offset of every row (plus the end of the last one), read from the sidecar on first use."""
+        import numpy as np
+        if self._row_offsets is None:
+            sizes = self.arrays.get("row_sizes")
+            if sizes is None:
+                with np.load(self.path_for(self.csv_path), allow_pickle=False) as data:
+                    sizes = data["row_sizes"]
+            self._row_offsets = self.meta["first_offset"] + np.concatenate([[0], np.cumsum(sizes, dtype=np.int64)])
+        return self._row_offsets
+
+    @staticmethod
+    def path_for(csv_path):
+        return csv_path + LogIndex.SUFFIX
+
+    @staticmethod
+    def _signature(csv_path):
+        st = os.stat(csv_path)
+        return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+    @classmethod
+    def indexable(cls, tid):
+        """True if every occurrence of tid can be answered from the index."""
+        return len(tid) >= cls.MIN_TOKEN_LEN and cls.TOKEN_RE.fullmatch(tid) is not None
+
+    @classmethod
+    def id_columns(cls, header):
+        """Positions of the columns indexed by default; all columns if none looks like an ID."""
+        return [i for i, name in enumerate(header) if cls.ID_COLUMN_RE.search(name)] or list(range(len(header)))
+
+    def covers(self, columns):
+        """True if a seek restricted to columns can be answered from the index."""
+        return all(c in self.columns for c in columns if c in self.header)
+
+    @property
+    def partial(self):
+        return len(self.columns) < len(self.header)
+
+    @classmethod
+    def load(cls, csv_path):
+        """Returns the index of csv_path, or None if there is none or it is stale."""
+        import numpy as np
+        path = cls.path_for(csv_path)
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+            if meta.get("version") != cls.VERSION or meta.get("signature") != cls._signature(csv_path):
+                logger.warning(f"Index {os.path.basename(path)} is stale, ignoring it.")
+                return None
+            arrays = {k: data[k] for k in cls.LOOKUP_ARRAYS}
+        arrays["vocab"] = arrays["vocab"].tobytes().decode("utf-8")
+        return cls(csv_path, meta, arrays)
+
+    @classmethod
+    def build(cls, csv_path, columns=None):
+        """
+        Scans csv_path once, writes the sidecar next to it and returns the index.
+        columns: names of the columns to index (default: id_columns).
+        """
+        import numpy as np
+        start_time = time.time()
+        signature = cls._signature(csv_path)
+        vocab = {}
+        events = {}
+        tokens, rows, cols = array('i'), array('i'), array('H')
+        row_events, row_offsets = array('i'), array('q')
+
+        with open_log(csv_path, text=False) as f:
+            records = _iter_raw_records(f)
+            _, first = next(records)
+            header = parse_record(first.decode('utf-8-sig'))
+            event_indices = LogAnalyzer.event_indices(header)
+            if columns:
+                indexed = [i for i, name in enumerate(header) if name in columns]
+                if not indexed:
+                    raise ValueError(f"None of the columns {', '.join(columns)} is in the file.")
+            else:
+                indexed = cls.id_columns(header)
+            logger.info(f"Indexing columns: {', '.join(header[i] for i in indexed)}")
+
+            end = len(first)
+            for row_no, (offset, raw) in enumerate(records):
+                if row_no and row_no % 500000 == 0:
+                    logger.info(f"Indexed {row_no:,} rows...")
+                row = parse_record(raw.decode('utf-8'))
+                row_events.append(events.setdefault(event_name(row, event_indices), len(events)))
+                row_offsets.append(offset)
+                end = offset + len(raw)
+                for col_idx in indexed:
+                    cell_value = row[col_idx] if col_idx < len(row) else ""
+                    if not cell_value:
+                        continue
+                    for token in {t for t in cls.TOKEN_RE.findall(cell_value) if len(t) >= cls.MIN_TOKEN_LEN}:
+                        tokens.append(vocab.setdefault(token, len(vocab)))
+                        rows.append(row_no)
+                        cols.append(col_idx)
+
+        # Group the postings by token; the stable sort keeps each token's rows ascending,
+        # so they are stored as deltas restarting at every token
+        token_ids = np.frombuffer(tokens, dtype=np.int32)
+        order = np.argsort(token_ids, kind='stable')
+        counts = np.bincount(token_ids, minlength=len(vocab)).astype(np.uint32)
+        sorted_rows = np.frombuffer(rows, dtype=np.int32)[order]
+        row_deltas = np.diff(sorted_rows, prepend=np.int32(0)).astype(np.int32)
+        token_starts = (np.cumsum(counts, dtype=np.int64) - counts)[counts > 0]
+        row_deltas[token_starts] = sorted_rows[token_starts]
+        words = list(vocab)
+
+        offsets = np.frombuffer(row_offsets, dtype=np.int64)
+        first_offset = int(offsets[0]) if len(offsets) else end
+        meta = {
+            "version": cls.VERSION, "signature": signature, "header": header, "events": list(events),
+            "columns": indexed, "first_offset": first_offset,
+        }
+        arrays = {
+            "vocab": "\n".join(words),
+            "vocab_lengths": np.fromiter((len(w) for w in words), dtype=np.uint32, count=len(words)),
+            "token_counts": counts,
+            "row_deltas": row_deltas,
+            "cell_cols": np.frombuffer(cols, dtype=np.uint16)[order],
+            "row_events": np.frombuffer(row_events, dtype=np.int32).astype(np.min_scalar_type(max(len(events) - 1, 0))),
+            "row_sizes": np.diff(np.append(offsets, end)).astype(np.uint32),
+        }
+        index = cls(csv_path, meta, arrays)
+        index.save()
+        logger.info(f"Indexed {index.rows:,} rows, {len(words):,} tokens in {time.time() - start_time:.2f}s")
+        return index
+
+    def save(self):
+        import numpy as np
+        path = self.path_for(self.csv_path)
+        tmp = path + ".tmp"
+        with open(tmp, 'wb') as f:
+            np.savez_compressed(
+                f,
+                meta=np.frombuffer(json.dumps(self.meta).encode("utf-8"), dtype=np.uint8),
+                vocab=np.frombuffer(self.vocab.encode("utf-8"), dtype=np.uint8),
+                **{k: v for k, v in self.arrays.items() if k != "vocab"}
+            )
+        os.replace(tmp, path)
+        logger.info(f"Index written to: {path} ({os.path.getsize(path) / 1024 / 1024:.1f} MB)")
+
+    def lookup(self, target_ids, context=0, columns=None):
+        """
+        Returns (results, samples): the same {tid: {(event, column): count}} as a scan
+        of the indexed columns, and up to `context` matching row numbers per ID.
+        columns restricts the lookup further.
+        """
+        import numpy as np
+        results = {tid: {} for tid in target_ids}
+        samples = {tid: [] for tid in target_ids}
+        matcher = IdMatcher(target_ids)
+        if not matcher.ids or not self.vocab:
+            return results, samples
+
+        # Which vocabulary tokens contain each ID
+        matched = {tid: set() for tid in matcher.ids}
+        for pos, ids in matcher.locate(self.vocab):
+            token = int(np.searchsorted(self.vocab_starts, pos, side='right')) - 1
+            for tid in ids:
+                matched[tid].add(token)
+
+        col_mask = (1 << self.COL_BITS) - 1
+        for tid, tokens in matched.items():
+            if not tokens:
+                continue
+            # A cell holding several matching tokens still counts once
+            cells = np.unique(np.concatenate([
+                np.cumsum(self.row_deltas[self.token_starts[t]:self.token_starts[t + 1]], dtype=np.int64) << self.COL_BITS
+                | self.cell_cols[self.token_starts[t]:self.token_starts[t + 1]]
+                for t in tokens
+            ]))
+            rows, cols = cells >> self.COL_BITS, cells & col_mask
+            if columns:
+                wanted = [i for i, name in enumerate(self.header) if name in columns]
+                keep = np.isin(cols, wanted)
+                rows, cols = rows[keep], cols[keep]
+                if not len(rows):
+                    continue
+            keys = self.row_events[rows].astype(np.int64) << self.COL_BITS | cols
+            uniq, first, counts = np.unique(keys, return_index=True, return_counts=True)
+            # Ordered by first occurrence, like a sequential scan
+            for i in np.argsort(first):
+                key = int(uniq[i])
+                location = (self.events[key >> self.COL_BITS], column_name(self.header, key & col_mask))
+                results[tid][location] = int(counts[i])
+            if context:
+                samples[tid] = [int(r) for r in np.unique(rows)[:context]]
+        return results, samples
+
+    def read_rows(self, row_numbers):
+        """
+        Fetches the raw records of the given rows from the CSV file. Offsets of a
+        compressed file refer to the decompressed stream, which is read forward to them.
+        """
+        records = {}
+        with open_log(self.csv_path, text=False) as f:
+            pos = 0
+            for row_no in sorted(set(row_numbers)):
+                start = int(self.row_offsets[row_no])
+                end = int(self.row_offsets[row_no + 1]) if row_no + 1 < self.rows else None
+                if f.seekable():
+                    f.seek(start)
+                else:
+                    while pos < start:
+                        skipped = f.read(min(start - pos, 1024 * 1024))
+                        if not skipped:
+                            break
+                        pos += len(skipped)
+                raw = f.read(end - start) if end is not None else f.read()
+                pos = start + len(raw)
+                records[row_no] = raw.decode('utf-8').rstrip('\r\n')
+        return [records[row_no] for row_no in row_numbers]
+
+def _iter_raw_records(f):
+    """Yields (byte offset, bytes) of every CSV record of a binary file, quoted line breaks included."""
+    offset = 0
+    pending, pending_offset = None, 0
+    for line in f:
+        if pending is not None:
+            pending += line
+            if pending.count(b'"') % 2 == 0:
+                yield pending_offset, pending
+                pending = None
+        elif line.count(b'"') % 2:
+            pending, pending_offset = line, offset
+        else:
+            yield offset, line
+        offset += len(line)
+    if pending is not None:
+        yield pending_offset, pending
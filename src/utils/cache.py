@@ -0,0 +1,199 @@
+import os
+import re
+import json
+import time
+import uuid
+import hashlib
+import threading
+import pandas as pd
+from src.config import settings
+from src.utils.logger import logger
+
+# Strings are matched first so that "--" or "/*" inside a literal is left alone
+_SQL_TOKEN_RE = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")|((?:\s|--[^\n]*|/\*.*?\*/)+)", re.S)
+
+class ResultCache:
+    """
+    Content-addressed cache of query results, stored as Parquet under data/cache/.
+    Entries are keyed by engine, region and a hash of the normalized SQL, expire
+    after the TTL given at lookup time, and the least recently used ones are
+    evicted once the total size exceeds max_bytes.
+    """
+    INDEX_FILE = "index.json"
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index = self._load_index()
+
+    @staticmethod
+    def normalize_sql(sql: str) -> str:
+        """Drops comments, collapses whitespace and trailing semicolons; literals are kept verbatim."""
+        normalized = _SQL_TOKEN_RE.sub(lambda m: m.group(1) or " ", sql)
+        return normalized.strip().rstrip(";").strip()
+
+    @classmethod
+    def make_key(cls, engine_name, region, sql):
+        raw = f"{engine_name}|{region}|{cls.normalize_sql(sql)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.parquet")
+
+    def _tmp_path(self, key):
+        # Unique per writer so concurrent tasks caching the same query do not collide
+        return os.path.join(self.cache_dir, f"{key}.{uuid.uuid4().hex}.tmp")
+
+    def _load_index(self):
+        path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # Drop entries whose data file has gone missing
+        return {k: v for k, v in index.items() if os.path.exists(self._path(k))}
+
+    def _save_index(self):
+        path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        tmp = path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f, indent=1)
+        os.replace(tmp, path)
+
+    def _remove(self, key):
+        self._index.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def get(self, key, ttl, stream=False, chunk_size=100000):
+        """
+        Returns the cached result (a DataFrame, or an iterator of DataFrame chunks when
+        stream=True) if it is younger than ttl seconds, otherwise None.
+        """
+        with self._lock:
+            entry = self._index.get(key)
+            if entry and time.time() - entry["created"] > ttl:
+                self._remove(key)
+                self._save_index()
+                entry = None
+            if entry is None:
+                self.misses += 1
+                logger.info(f"Cache miss {key[:12]} (hits={self.hits}, misses={self.misses})")
+                return None
+            entry["last_access"] = time.time()
+            self._save_index()
+            self.hits += 1
+            age = int(time.time() - entry["created"])
+        logger.info(f"Cache hit {key[:12]}, {entry['rows']:,} rows cached {age}s ago (hits={self.hits}, misses={self.misses})")
+
+        if stream:
+            return self._iter_cached(self._path(key), chunk_size)
+        return pd.read_parquet(self._path(key))
+
+    @staticmethod
+    def _iter_cached(path, chunk_size):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+
+    def put(self, key, results, engine_name="", region=""):
+        """
+        Stores a fetch result and returns it unchanged for the caller to export.
+        Chunk iterators are wrapped so they are written to the cache as they are consumed.
+        """
+        meta = {"engine": engine_name, "region": region}
+        try:
+            if isinstance(results, pd.DataFrame):
+                tmp = self._tmp_path(key)
+                results.to_parquet(tmp, index=False)
+                self._commit(key, tmp, len(results), meta)
+            elif isinstance(results, list) and results and isinstance(results[-1], dict):
+                if results[0].get("type") == "file":
+                    self._put_csv(key, results[0].get("file_path"), meta)
+                else:
+                    headers = results[-1].get("header", []) or results[-1].get("headers", [])
+                    rows = results[-1].get("rows", []) or results[-1].get("results", [])
+                    if rows:
+                        tmp = self._tmp_path(key)
+                        pd.DataFrame(rows, columns=headers).to_parquet(tmp, index=False)
+                        self._commit(key, tmp, len(rows), meta)
+            elif results is not None and hasattr(results, "__next__"):
+                return self._tee_chunks(key, results, meta)
+        except Exception as e:
+            logger.warning(f"Could not cache result: {e}")
+        return results
+
+    def _put_csv(self, key, csv_path, meta):
+        """Converts a downloaded CSV into the cache with Arrow's streaming reader."""
+        import pyarrow.csv as pv
+        import pyarrow.parquet as pq
+        tmp = self._tmp_path(key)
+        rows = 0
+        reader = pv.open_csv(csv_path)
+        with pq.ParquetWriter(tmp, reader.schema) as writer:
+            for batch in reader:
+                writer.write_batch(batch)
+                rows += batch.num_rows
+        self._commit(key, tmp, rows, meta)
+
+    def _tee_chunks(self, key, chunks, meta):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        tmp = self._tmp_path(key)
+        writer = None
+        failed = False
+        completed = False
+        rows = 0
+        try:
+            for chunk in chunks:
+                if not failed:
+                    try:
+                        if writer is None:
+                            writer = pq.ParquetWriter(tmp, pa.Schema.from_pandas(chunk, preserve_index=False))
+                        writer.write_table(pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False))
+                        rows += len(chunk)
+                    except Exception as e:
+                        logger.warning(f"Could not cache result: {e}")
+                        failed = True
+                yield chunk
+            completed = True
+        finally:
+            if writer is not None:
+                writer.close()
+            if completed and not failed and writer is not None:
+                self._commit(key, tmp, rows, meta)
+            elif os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _commit(self, key, tmp_path, rows, meta):
+        with self._lock:
+            os.replace(tmp_path, self._path(key))
+            now = time.time()
+            self._index[key] = {
+                **meta, "rows": rows, "size": os.path.getsize(self._path(key)),
+                "created": now, "last_access": now
+            }
+            self._evict()
+            self._save_index()
+
+    def _evict(self):
+        total = sum(e["size"] for e in self._index.values())
+        for key, entry in sorted(self._index.items(), key=lambda kv: kv[1]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            logger.info(f"Evicting cached result {key[:12]} ({entry['size'] / 1024 / 1024:.1f} MB)")
+            total -= entry["size"]
+            self._remove(key)
+
+    def log_stats(self):
+        if self.hits or self.misses:
+            logger.info(f"Result cache: {self.hits} hits, {self.misses} misses.")
+
+result_cache = ResultCache(settings.CACHE_DIR, settings.CACHE_MAX_MB * 1024 * 1024)
@@ -1,12 +1,37 @@
 import pandas as pd
 import os
+import time
+import queue
+import shutil
+import itertools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from src.utils.logger import logger
 from src.config import settings
 
-def export_data(results, filename_prefix="data_export", formats=["xlsx"], output_dir=None):
+# Arrow IPC (Feather v2) file format, under either extension
+ARROW_IPC_FORMATS = ["feather", "arrow"]
+SUPPORTED_FORMATS = ["xlsx", "csv", "json", "txt", "tsv", "parquet"] + ARROW_IPC_FORMATS
+# Excel hard limit per sheet, header row included
+XLSX_MAX_ROWS = 1048576
+# Rows converted per step when writing a materialized DataFrame to xlsx
+XLSX_CHUNK_ROWS = 50000
+# Rows per chunk when converting a downloaded CSV file
+CSV_CHUNK_ROWS = 100000
+# Chunks a writer may lag behind the reader before the reader blocks
+EXPORT_QUEUE_DEPTH = 4
+# Rows a parquet/feather writer buffers while a column is still all-null; such columns
+# are written as strings once the buffer is full
+ARROW_SCHEMA_BUFFER_ROWS = 500000
+
+_DONE = object()
+
+def export_data(results, filename_prefix="data_export", formats=["xlsx"], output_dir=None, compression=None):
     """
-    Export results to multiple formats (xlsx, csv, json).
+    Export results to multiple formats (xlsx, csv, json, txt, parquet, feather/arrow).
+    Every format is written by its own worker from the same in-memory DataFrame.
+    compression selects the parquet/feather codec (defaults: PARQUET_COMPRESSION / lz4).
     Returns a list of generated file paths.
     """
     if results is None:
@@ -15,7 +40,7 @@ def export_data(results, filename_prefix="data_export", formats=["xlsx"], output
     # Use default export dir from settings if not specified
     if output_dir is None:
         output_dir = settings.EXPORT_DIR
-    
+
     if not os.path.exists(output_dir):
         os.makedirs(output_dir, exist_ok=True)
 
@@ -31,35 +56,445 @@ def export_data(results, filename_prefix="data_export", formats=["xlsx"], output
             rows = last_item.get("rows", []) or last_item.get("results", [])
             if rows:
                 df = pd.DataFrame(rows, columns=headers)
-    
+
     if df is None:
         logger.warning("No data available to export.")
         return []
 
-    # 2. Export to each requested format
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    # 2. Export to each requested format in parallel
+    targets = _resolve_targets(formats, output_dir, filename_prefix)
+
+    def write(fmt, filepath):
+        start = time.time()
+        _write_frame(fmt, df, filepath, compression)
+        return time.time() - start
+
+    file_paths = []
+    for (fmt, filepath), outcome in zip(targets, _run_parallel(write, targets)):
+        if isinstance(outcome, Exception):
+            logger.error(f"Export to {fmt} failed: {outcome}")
+            continue
+        logger.info(f"Data successfully exported to: {filepath} ({len(df):,} rows in {outcome:.2f}s)")
+        file_paths.append(filepath)
+    return file_paths
+
+def export_chunks(chunks, filename_prefix="data_export", formats=["csv"], output_dir=None, compression=None):
+    """
+    Export an iterator of DataFrame chunks in a single pass without materializing the
+    full result. Each chunk is handed to one writer thread per format through a
+    bounded queue, so memory stays at a few chunks regardless of result size.
+    Returns a list of generated file paths.
+    """
+    if output_dir is None:
+        output_dir = settings.EXPORT_DIR
+    os.makedirs(output_dir, exist_ok=True)
+
+    targets = _resolve_targets(formats, output_dir, filename_prefix)
+    if not targets:
+        return []
+    queues = [queue.Queue(maxsize=EXPORT_QUEUE_DEPTH) for _ in targets]
+    slots = {target: q for target, q in zip(targets, queues)}
+
+    def write(fmt, filepath):
+        q = slots[(fmt, filepath)]
+        writer = None
+        busy = 0.0
+        rows = 0
+        try:
+            while True:
+                chunk = q.get()
+                if chunk is _DONE:
+                    break
+                start = time.time()
+                if writer is None:
+                    writer = _open_chunk_writer(fmt, filepath, compression)
+                writer.write(chunk)
+                busy += time.time() - start
+                rows += len(chunk)
+        except Exception:
+            # Keep draining so the reader never blocks on a dead writer
+            while q.get() is not _DONE:
+                pass
+            raise
+        finally:
+            if writer is not None:
+                start = time.time()
+                writer.close()
+                busy += time.time() - start
+        return writer is not None, rows, busy
+
+    row_count = 0
+
+    def feed():
+        nonlocal row_count
+        try:
+            for chunk in chunks:
+                row_count += len(chunk)
+                for q in queues:
+                    q.put(chunk)
+        finally:
+            for q in queues:
+                q.put(_DONE)
+
+    outcomes = _run_parallel(write, targets, feed=feed)
+
     file_paths = []
+    for (fmt, filepath), outcome in zip(targets, outcomes):
+        if isinstance(outcome, Exception):
+            logger.error(f"Export to {fmt} failed: {outcome}")
+            if os.path.exists(filepath):
+                os.remove(filepath)
+            continue
+        opened, rows, busy = outcome
+        if opened:
+            logger.info(f"Data successfully exported to: {filepath} ({rows:,} rows in {busy:.2f}s)")
+            file_paths.append(filepath)
+
+    if row_count == 0 and not file_paths:
+        logger.warning("No data available to export.")
+    return file_paths
+
+def export_file(file_path, filename_prefix="data_export", formats=["csv"], output_dir=None, compression=None, chunk_size=CSV_CHUNK_ROWS):
+    """
+    Exports a downloaded CSV file (TA download, Holo COPY) without loading it into memory.
+    The csv target is produced by moving the file into place; other formats are converted
+    from a chunked read through export_chunks. The source file is consumed only when every
+    requested format was written; otherwise it is kept and returned with the other paths.
+    Returns a list of generated file paths.
+    """
+    if output_dir is None:
+        output_dir = settings.EXPORT_DIR
+    os.makedirs(output_dir, exist_ok=True)
+
+    wanted = [f.lower().strip() for f in formats]
+    converted = [f for f in wanted if f != "csv"]
+    # Resolved up front so the moved file shares the converted files' timestamp
+    csv_target = _resolve_targets(["csv"], output_dir, filename_prefix)[0][1] if "csv" in wanted else None
+    file_paths = []
+    if converted:
+        # Chunks would each infer their own dtypes, so the types are inferred once over
+        # the whole file and every chunk is read with them
+        dtypes = _infer_csv_dtypes(file_path, chunk_size)
+        reader = pd.read_csv(file_path, chunksize=chunk_size, encoding='utf-8-sig', dtype=dtypes)
+        try:
+            file_paths = export_chunks(reader, filename_prefix=filename_prefix, formats=converted,
+                                       output_dir=output_dir, compression=compression)
+        finally:
+            reader.close()
+
+    if csv_target:
+        start = time.time()
+        shutil.move(file_path, csv_target)
+        logger.info(f"Data successfully exported to: {csv_target} (moved in {time.time() - start:.2f}s)")
+        file_paths.append(csv_target)
+    elif len(file_paths) == len([f for f in converted if f in SUPPORTED_FORMATS]) and file_paths:
+        os.remove(file_path)
+    else:
+        logger.warning(f"Not every format was exported, keeping the downloaded file: {file_path}")
+        file_paths.append(file_path)
+    return file_paths
+
+def _infer_csv_dtypes(file_path, chunk_size=CSV_CHUNK_ROWS):
+    """
+    Column dtypes of a CSV file, from a chunked pass over the whole file with pandas'
+    own inference, merged across chunks: integers (also when some chunks only have them
+    as floats because of empty cells) become nullable Int64, numbers with fractions
+    float64, booleans boolean, and a column with any non-numeric value text.
+    """
+    kinds = {}
+    for chunk in pd.read_csv(file_path, chunksize=chunk_size, encoding='utf-8-sig'):
+        for name, column in chunk.items():
+            values = column.dropna()
+            if values.empty:
+                kinds.setdefault(name, None)
+                continue
+            kind = column.dtype.kind
+            if kind == 'f' and (values % 1 == 0).all():
+                kind = 'i'
+            elif kind not in 'ifb':
+                kind = 'O'
+            previous = kinds.get(name)
+            if previous is None or previous == kind:
+                kinds[name] = kind
+            else:
+                kinds[name] = 'f' if {previous, kind} == {'i', 'f'} else 'O'
+    return {name: {'i': 'Int64', 'f': 'float64', 'b': 'boolean'}.get(kind, str) for name, kind in kinds.items()}
+
+def peek_chunks(chunks):
+    """
+    Returns (first_chunk, chunks) where the returned iterator still yields the first chunk.
+    first_chunk is None for an empty iterator.
+    """
+    chunks = iter(chunks)
+    first = next(chunks, None)
+    if first is None:
+        return None, iter(())
+    return first, itertools.chain([first], chunks)
 
+def _resolve_targets(formats, output_dir, filename_prefix):
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    targets = []
     for fmt in formats:
         fmt = fmt.lower().strip()
-        filepath = os.path.join(output_dir, f"{filename_prefix}_{timestamp}.{fmt}")
-        
+        if fmt not in SUPPORTED_FORMATS:
+            logger.error(f"Unsupported format: {fmt}")
+            continue
+        targets.append((fmt, os.path.join(output_dir, f"{filename_prefix}_{timestamp}.{fmt}")))
+    return targets
+
+def _run_parallel(write, targets, feed=None):
+    """
+    Runs write(fmt, filepath) for every target on its own thread and returns the
+    results (or raised exceptions) in target order. If given, feed() runs on the
+    calling thread while the writers are active; its exceptions are re-raised after
+    the writers have finished.
+    """
+    if not targets:
+        return []
+    if len(targets) == 1 and feed is None:
         try:
-            if fmt == "xlsx":
-                df.to_excel(filepath, index=False)
-            elif fmt == "csv":
-                df.to_csv(filepath, index=False, encoding='utf-8-sig')
-            elif fmt == "json":
-                df.to_json(filepath, orient='records', force_ascii=False, indent=4)
-            elif fmt in ["txt", "tsv"]:
-                df.to_csv(filepath, sep='\t', index=False, encoding='utf-8-sig')
-            else:
-                logger.error(f"Unsupported format: {fmt}")
-                continue
-                
-            logger.info(f"Data successfully exported to: {filepath}")
-            file_paths.append(filepath)
+            return [write(*targets[0])]
         except Exception as e:
-            logger.error(f"Export to {fmt} failed: {e}")
+            return [e]
 
-    return file_paths
+    with ThreadPoolExecutor(max_workers=len(targets), thread_name_prefix="export") as pool:
+        # Writers inherit the caller's context so their log lines keep the task prefix
+        futures = [pool.submit(contextvars.copy_context().run, write, *t) for t in targets]
+        feed_error = None
+        if feed is not None:
+            try:
+                feed()
+            except Exception as e:
+                feed_error = e
+        outcomes = []
+        for future in futures:
+            try:
+                outcomes.append(future.result())
+            except Exception as e:
+                outcomes.append(e)
+
+    if feed_error is not None:
+        for (_, filepath), outcome in zip(targets, outcomes):
+            if os.path.exists(filepath):
+                os.remove(filepath)
+        raise feed_error
+    return outcomes
+
+def _write_frame(fmt, df, filepath, compression=None):
+    """Writes a materialized DataFrame using the fastest native path for the format."""
+    if fmt == "xlsx":
+        writer = XlsxChunkWriter(filepath)
+        try:
+            for start in range(0, max(len(df), 1), XLSX_CHUNK_ROWS):
+                writer.write(df.iloc[start:start + XLSX_CHUNK_ROWS])
+        finally:
+            writer.close()
+    elif fmt == "csv":
+        df.to_csv(filepath, index=False, encoding='utf-8-sig')
+    elif fmt == "json":
+        df.to_json(filepath, orient='records', force_ascii=False, indent=4)
+    elif fmt in ["txt", "tsv"]:
+        df.to_csv(filepath, sep='\t', index=False, encoding='utf-8-sig')
+    elif fmt == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(_to_arrow_table(df), filepath, compression=_parquet_codec(compression))
+    elif fmt in ARROW_IPC_FORMATS:
+        import pyarrow.feather as feather
+        feather.write_feather(_to_arrow_table(df), filepath, compression=_ipc_codec(compression))
+
+def _open_chunk_writer(fmt, filepath, compression=None):
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        return _ArrowChunkWriter(lambda schema: pq.ParquetWriter(filepath, schema, compression=_parquet_codec(compression)))
+    if fmt in ARROW_IPC_FORMATS:
+        pa = _pyarrow()
+        codec = _ipc_codec(compression)
+        options = pa.ipc.IpcWriteOptions(compression=None if codec == "uncompressed" else codec)
+        return _ArrowChunkWriter(lambda schema: pa.ipc.new_file(filepath, schema, options=options))
+    if fmt == "xlsx":
+        return XlsxChunkWriter(filepath)
+    if fmt == "json":
+        return _JsonChunkWriter(filepath)
+    return _TextChunkWriter(filepath, sep='\t' if fmt in ["txt", "tsv"] else ',')
+
+class XlsxChunkWriter:
+    """
+    Constant-memory xlsx writer built on openpyxl's write-only mode.
+    Rows are streamed to disk as chunks arrive, and a new sheet (Sheet2, Sheet3, ...)
+    with a repeated header is started whenever a sheet reaches Excel's row limit.
+    """
+    def __init__(self, filepath, max_rows=XLSX_MAX_ROWS):
+        from openpyxl import Workbook
+        self.filepath = filepath
+        self.max_rows = max_rows
+        self.workbook = Workbook(write_only=True)
+        self.sheet = None
+        self.sheet_rows = 0
+        self.header = None
+
+    def _new_sheet(self):
+        self.sheet = self.workbook.create_sheet(f"Sheet{len(self.workbook.worksheets) + 1}")
+        self.sheet.append(self.header)
+        self.sheet_rows = 1
+        if len(self.workbook.worksheets) > 1:
+            logger.info(f"Excel row limit reached, continuing on {self.sheet.title}.")
+
+    def write(self, chunk):
+        if self.header is None:
+            self.header = [str(c) for c in chunk.columns]
+            self._new_sheet()
+        # NaN / NaT / pd.NA become empty cells
+        values = chunk.astype(object).where(chunk.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            if self.sheet_rows >= self.max_rows:
+                self._new_sheet()
+            self.sheet.append(row)
+            self.sheet_rows += 1
+
+    def close(self):
+        if self.sheet is None:
+            self.workbook.create_sheet("Sheet1")
+        self.workbook.save(self.filepath)
+
+class _ArrowChunkWriter:
+    """
+    Appends DataFrame chunks to a Parquet or Arrow IPC writer under one schema.
+    Engines infer dtypes per chunk, while the file schema is fixed once the writer is
+    opened: chunks are buffered while a column is still all-null (null -> the first
+    real type, or string after ARROW_SCHEMA_BUFFER_ROWS rows), the buffered schemas
+    are unified with type promotion (int -> float, otherwise string), and every chunk
+    is cast to the resulting schema.
+    """
+    def __init__(self, open_writer):
+        self.open_writer = open_writer
+        self.writer = None
+        self.schema = None
+        self.pending = []
+        self.pending_rows = 0
+
+    def write(self, chunk):
+        if self.writer is not None:
+            self.writer.write_table(_cast_to_schema(chunk, self.schema))
+            return
+        schema = _arrow_schema(chunk)
+        self.schema = schema if self.schema is None else _unify_schemas(self.schema, schema)
+        self.pending.append(chunk)
+        self.pending_rows += len(chunk)
+        if self.pending_rows >= ARROW_SCHEMA_BUFFER_ROWS or not any(_is_null(f.type) for f in self.schema):
+            self._open()
+
+    def _open(self):
+        pa = _pyarrow()
+        if self.schema is None:
+            self.schema = pa.schema([])
+        if any(_is_null(f.type) for f in self.schema):
+            self.schema = pa.schema([f.with_type(pa.string()) if _is_null(f.type) else f for f in self.schema]).remove_metadata()
+        self.writer = self.open_writer(self.schema)
+        for chunk in self.pending:
+            self.writer.write_table(_cast_to_schema(chunk, self.schema))
+        self.pending = []
+
+    def close(self):
+        if self.writer is None:
+            self._open()
+        self.writer.close()
+
+class _TextChunkWriter:
+    """Appends chunks to a csv/tsv file; the header is written once."""
+    def __init__(self, filepath, sep=','):
+        # utf-8-sig only emits the BOM once, at the start of the file
+        self.file = open(filepath, 'w', encoding='utf-8-sig', newline='')
+        self.sep = sep
+        self.header = True
+
+    def write(self, chunk):
+        chunk.to_csv(self.file, sep=self.sep, index=False, header=self.header)
+        self.header = False
+
+    def close(self):
+        self.file.close()
+
+class _JsonChunkWriter:
+    """Writes chunks as one JSON array, in the same layout as df.to_json(orient='records', indent=4)."""
+    def __init__(self, filepath):
+        self.file = open(filepath, 'w', encoding='utf-8')
+        self.rows = 0
+
+    def write(self, chunk):
+        if chunk.empty:
+            return
+        text = chunk.to_json(orient='records', force_ascii=False, indent=4)
+        records = text.strip()[1:-1].strip('\n')
+        self.file.write(("[\n" if self.rows == 0 else ",\n") + records)
+        self.rows += len(chunk)
+
+    def close(self):
+        self.file.write("\n]" if self.rows else "[]")
+        self.file.close()
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+    except ImportError:
+        logger.error("Module 'pyarrow' not found. Please install pyarrow.")
+        raise
+    return pa
+
+def _to_arrow_table(df):
+    """
+    Converts a DataFrame to an Arrow table. Columns that are already Arrow-backed
+    (pd.ArrowDtype) are wrapped as-is rather than copied.
+    """
+    return _pyarrow().Table.from_pandas(df, preserve_index=False)
+
+def _arrow_schema(df):
+    return _pyarrow().Schema.from_pandas(df, preserve_index=False)
+
+def _is_null(arrow_type):
+    return _pyarrow().types.is_null(arrow_type)
+
+def _unify_schemas(schema, other):
+    """
+    Field-wise promotion of schema by a later chunk's schema: null takes the other
+    type, numeric types widen (int64 + double -> double), anything else becomes string.
+    The pandas metadata is dropped once a type changes, as it describes the first chunk.
+    """
+    pa = _pyarrow()
+    fields = []
+    for field in schema:
+        index = other.get_field_index(field.name)
+        if index < 0 or other.field(index).type == field.type or _is_null(other.field(index).type):
+            fields.append(field)
+            continue
+        try:
+            merged = pa.unify_schemas([pa.schema([field]), pa.schema([other.field(index)])], promote_options="permissive")
+            fields.append(merged.field(0))
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            fields.append(field.with_type(pa.string()))
+    if all(f.type == g.type for f, g in zip(fields, schema)):
+        return schema
+    return pa.schema(fields)
+
+def _cast_to_schema(df, schema):
+    """Converts a chunk to an Arrow table of the given schema, casting columns whose dtype drifted."""
+    pa = _pyarrow()
+    try:
+        return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        pass
+    columns = []
+    for field in schema:
+        array = pa.array(df[field.name], from_pandas=True)
+        try:
+            columns.append(array.cast(field.type))
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+            raise ValueError(f"Column '{field.name}' ({array.type}) does not fit the export schema ({field.type}): {e}") from e
+    return pa.Table.from_arrays(columns, schema=schema)
+
+def _parquet_codec(compression):
+    return (compression or settings.PARQUET_COMPRESSION).lower()
+
+def _ipc_codec(compression):
+    # Arrow IPC only supports lz4 and zstd
+    codec = (compression or "lz4").lower()
+    return codec if codec in ("lz4", "zstd", "uncompressed") else "lz4"
@@ -1,4 +1,5 @@
 import logging
+import contextvars
 from rich.logging import RichHandler
 
 # Configure rich logger
@@ -9,4 +10,20 @@ logging.basicConfig(
     handlers=[RichHandler(rich_tracebacks=True, show_path=True)]
 )
 
+# Name of the task running in the current thread (set by the batch executor)
+task_context = contextvars.ContextVar("task_context", default=None)
+
+class TaskContextFilter(logging.Filter):
+    """
+    Prefixes log records with the current task name so that output
+    from tasks running in parallel stays distinguishable.
+    """
+    def filter(self, record):
+        task_name = task_context.get()
+        if task_name:
+            record.msg = f"[{task_name}] {record.getMessage()}"
+            record.args = ()
+        return True
+
 logger = logging.getLogger("fivecross")
+logger.addFilter(TaskContextFilter())
@@ -4,6 +4,7 @@ import argparse
 from rich.console import Console
 from rich.table import Table
 from rich.panel import Panel
+from rich.markup import escape
 
 # Add project root to sys.path to allow imports from src
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -13,12 +14,15 @@ from src.utils.logger import logger
 
 console = Console()
 
+# Plain and compressed CSV exports
+CSV_EXTENSIONS = ('.csv', '.csv.gz', '.csv.zst')
+
 def find_latest_csv(base_dir):
     """Finds the most recently modified CSV in output or subdirs."""
     csv_files = []
     for root, _, files in os.walk(base_dir):
         for f in files:
-            if f.lower().endswith('.csv'):
+            if f.lower().endswith(CSV_EXTENSIONS):
                 path = os.path.join(root, f)
                 csv_files.append((path, os.path.getmtime(path)))
     
@@ -31,12 +35,19 @@ def main():
     parser = argparse.ArgumentParser(description="FiveCross Log Seeker - Locate IDs in massive CSV logs.")
     parser.add_argument("ids", nargs="*", help="IDs to search for (space separated)")
     parser.add_argument("--path", help="Path to specific CSV file. If omitted, finds latest in output/")
+    parser.add_argument("--workers", type=int, default=1, help="Processes scanning the file in parallel (default: 1)")
+    parser.add_argument("--build-index", action="store_true", help="Build (or rebuild) the index sidecar next to the CSV before seeking, over --columns or the ID columns")
+    parser.add_argument("--no-index", action="store_true", help="Ignore the index sidecar and scan the file")
+    parser.add_argument("--columns", help="Comma-separated columns to search (e.g. #account_id,#distinct_id); only these are read")
+    parser.add_argument("--context", type=int, default=0, help="Matching rows to show per ID (index only)")
     
     args = parser.parse_args()
     
     # Configuration
     target_ids = args.ids if args.ids else ['100000000'] # Maintain your defaults
     
+    columns = [c.strip() for c in args.columns.split(",") if c.strip()] if args.columns else None
+
     csv_path = args.path
     if not csv_path:
         output_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "output")
@@ -49,9 +60,21 @@ def main():
         console.print("[bold red]Error:[/bold red] No CSV files found in output/ or current directory.")
         sys.exit(1)
 
+    if args.build_index:
+        with console.status(f"[bold green]Indexing {os.path.basename(csv_path)}..."):
+            try:
+                LogAnalyzer.build_index(csv_path, columns)
+            except Exception as e:
+                console.print(f"[bold red]Failed:[/bold red] {e}")
+                sys.exit(1)
+
     with console.status(f"[bold green]Analyzing {os.path.basename(csv_path)}..."):
         try:
-            report = LogAnalyzer.analyze_csv(csv_path, target_ids)
+            report = LogAnalyzer.analyze_csv(
+                csv_path, target_ids, workers=args.workers,
+                use_index=not args.no_index, context=args.context,
+                columns=columns
+            )
         except Exception as e:
             console.print(f"[bold red]Failed:[/bold red] {e}")
             sys.exit(1)
@@ -63,7 +86,8 @@ def main():
     console.print(Panel(
         f"[bold blue]File:[/bold blue] {meta['file']}\n"
         f"[bold blue]Rows:[/bold blue] {meta['rows']:,}\n"
-        f"[bold blue]Time:[/bold blue] {meta['duration']:.2f} seconds",
+        f"[bold blue]Time:[/bold blue] {meta['duration']:.2f} seconds\n"
+        f"[bold blue]Source:[/bold blue] {meta['source']}",
         title="[bold white]Analysis Summary[/bold white]",
         expand=False
     ))
@@ -81,6 +105,8 @@ def main():
                 table.add_row(event, col, str(count))
         
         console.print(table)
+        for row_no, record in report["samples"].get(tid, []):
+            console.print(f"  [dim]row {row_no + 1:,}:[/dim] {escape(record)}", overflow="ellipsis", no_wrap=True)
         console.print("")
 
 if __name__ == "__main__":